@@ -0,0 +1,83 @@
+"""
+Benchmark of the Speckle ingestion pipeline (model_data -> commits_data -> extract_metadata ->
+aggregation) against the offline stand-in of `utils_fake_speckle`.
+
+Usage:
+    python benchmarks/bench_ingestion.py --commits 10 1000 10000 --elements 10 --latency 0.01
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+
+from utils import utils_speckle  # noqa: E402
+from utils.utils_cache import ObjectCacheTransport  # noqa: E402
+from utils.utils_fake_speckle import generate_project, use_fake_backend  # noqa: E402
+
+MODEL_NAME = 'compute/facade'
+
+
+def measure(func):
+    """
+    Runs a function and returns its result, the elapsed seconds and the peak of the memory
+    allocated by Python (MB).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def bench(n_commits: int, n_elements: int, latency: float, cache_dir: str) -> list:
+    server = generate_project(n_commits, n_elements, model_name=MODEL_NAME)
+    server.latency = latency
+    cache = ObjectCacheTransport(os.path.join(cache_dir, f'cache_{n_commits}.db'))
+    rows = []
+
+    def run(label):
+        server.requests, server.bytes_sent = 0, 0
+        (metadata, attributes), elapsed, peak = measure(
+            lambda: utils_speckle.update_commit([MODEL_NAME]))
+        assert len(attributes) == n_commits, f'{len(attributes)} of {n_commits} commits'
+        rows.append((n_commits, label, elapsed, n_commits / elapsed, peak, server.requests,
+                     server.bytes_sent / 1024 / 1024))
+
+    # Cold: empty cache and empty stores
+    use_fake_backend(server, cache, utils_speckle)
+    run('cold')
+    # Restart: the stores are empty but the local cache is warm
+    use_fake_backend(server, cache, utils_speckle)
+    run('restart')
+    # Refresh: nothing new since the last sync
+    server.requests, server.bytes_sent = 0, 0
+    _, elapsed, peak = measure(lambda: utils_speckle.update_commit([MODEL_NAME]))
+    rows.append((n_commits, 'refresh', elapsed, float('nan'), peak, server.requests, 0.0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--commits', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--elements', type=int, default=10, help='Pieces per commit')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every request of the fake server')
+    args = parser.parse_args()
+
+    print(f"{'commits':>8} {'run':>8} {'seconds':>9} {'commits/s':>10} {'peak MB':>8} "
+          f"{'requests':>9} {'MB sent':>8}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for n_commits in args.commits:
+            for row in bench(n_commits, args.elements, args.latency, cache_dir):
+                print('{:>8} {:>8} {:>9.3f} {:>10.1f} {:>8.1f} {:>9} {:>8.2f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
 from src.core_callbacks import *
 from src.callbacks import (callback_views, callback_speckle, callback_compute)
 import src.config.logs
-from utils.utils import start_compute, start_appserver
+from src.utils.utils_supervisor import supervisor
+from src.utils.utils_sync import sync_worker
+from src.utils.utils_jobs import job_pool
 
 """
 from src.core_callbacks import *
@@ -9,6 +11,8 @@ from src.callbacks import (callback_layout, callback_response, callback_compute)
 """
 
 if __name__ == '__main__':
-    # start_compute()
-    # start_appserver()
+    # Rhino.compute and the appserver start in parallel, /api/health reports when they are ready
+    supervisor.start()
+    sync_worker.start()
+    job_pool.start()
     dash_app.run_server(debug=False, use_reloader=False, port=5000)
@@ -1,11 +1,17 @@
+import json
 import logging
-import requests
 import sqlite3
 
 import dash
-from flask import jsonify, request
+from flask import Response, jsonify, make_response, request, stream_with_context
 
+from config.settings import COMPUTE_DEBOUNCE_MS, COMPUTE_STREAM_KEEPALIVE, COMPUTE_BATCH_MAX
 from src.core_callbacks import app, dash_app
+from src.utils.utils_compute import submit_parameters, submit_batch, grid_parameters, \
+    latin_hypercube_parameters, validate_slider_values
+from src.utils.utils_jobs import cached_result, record_result, report_commit
+from src.utils.utils_supervisor import supervisor
+from src.utils.utils_database import compute_db
 
 
 # Interaction with the sliders values
@@ -35,50 +41,84 @@ def update_slider_values_store(span, count, radius, message) -> dict:
 
 
 @dash_app.callback(
-    dash.dependencies.Output('dummy-output', 'children'),
+    dash.dependencies.Output('store-cached-commit', 'data'),
     [dash.dependencies.Input('bake-button', 'n_clicks')],
-    [dash.dependencies.State('slider-values-store', 'data')]
+    [dash.dependencies.State('slider-values-store', 'data'),
+     dash.dependencies.State('store-session-id', 'data')]
 )
-def update_slider_values(n_clicks, slider_data):
+def update_slider_values(n_clicks, slider_data, session_id=None):
     """
     This callback sends the slider values to the compute.app.
 
     Args:
         n_clicks: Number of clicks on the bake button
         slider_data: The slider values
+        session_id: The id of the browser session, its bakes are coalesced together
 
     Returns:
-        None
+        The commit of the slider values if they were already computed, the iframe shows it
+        without computing them again
     """
-    if n_clicks is not None:
-        client_ip = f"http://{request.remote_addr}:5000"
-        requests.post(f'{client_ip}/api/slider_compute',
-                      json={'slider-values-store': slider_data})
+    if n_clicks is not None and slider_data is not None:
+        try:
+            cached = cached_result(slider_data)
+            if cached is not None:
+                logging.info(f'Slider values already computed in the commit '
+                             f'{cached["commit_id"]}')
+                return cached
+            # Queued in the background, only the settled values of a burst of changes are kept
+            submit_parameters(slider_data, wait=False, client=session_id)
+        except ValueError as e:
+            logging.error(e)
+    raise dash.exceptions.PreventUpdate
+
+
+# Random id of the browser session, kept while the tab is open
+dash_app.clientside_callback(
+    """
+    function(modified, sessionId) {
+        if (sessionId) {
+            return window.dash_clientside.no_update;
+        }
+        return (window.crypto && window.crypto.randomUUID) ? window.crypto.randomUUID() :
+            Math.random().toString(36).slice(2) + Date.now().toString(36);
+    }
+    """,
+    dash.dependencies.Output('store-session-id', 'data'),
+    [dash.dependencies.Input('store-session-id', 'modified_timestamp')],
+    [dash.dependencies.State('store-session-id', 'data')]
+)
 
 
 # Endpoints API compute.webapp
 @app.route('/api/health', methods=['GET'])
 def healthcheck():
     """
-    Healthcheck endpoint
+    Healthcheck endpoint, with the state of the supervised compute processes
     """
-    return jsonify({'status': 'ok'})
+    health = supervisor.status()
+    return jsonify(health), 200 if health['status'] == 'ok' else 503
 
 
+# Bake once the sliders are left still for COMPUTE_DEBOUNCE_MS, each change restarts the wait
 dash_app.clientside_callback(
     """
     function(data) {
-        document.getElementById('bake-button').click();
+        clearTimeout(window.bakeTimeout);
+        window.bakeTimeout = setTimeout(function() {
+            document.getElementById('bake-button').click();
+        }, %d);
+        return window.dash_clientside.no_update;
     }
-    """,
+    """ % COMPUTE_DEBOUNCE_MS,
     dash.dependencies.Output('bake-button', 'n_clicks'),
     [dash.dependencies.Input('slider-values-store', 'data')]
 )
 
 
-def post_slider_values(cur):
+def post_slider_values():
     # If POST request, update the slider values in the database
-    data = request.get_json()
+    data = request.get_json(silent=True)
     if data is None:
         return jsonify({'error': 'No data provided'}), 400
     slider_values = data.get('slider-values-store')
@@ -86,47 +126,46 @@ def post_slider_values(cur):
         return jsonify({'error': 'No slider values provided'}), 400
 
     try:
-        # Create the table if it doesn't exist
-        cur.execute("""
-                CREATE TABLE IF NOT EXISTS slider_values (
-                    id SERIAL PRIMARY KEY,
-                    radius INTEGER,
-                    counte INTEGER,
-                    span INTEGER,
-                    commit_message TEXT
-                )
-            """)
-
-        # Insert the slider values into the table
-        cur.execute("""
-                INSERT INTO slider_values (radius, counte, span, commit_message)
-                VALUES (?, ?, ?, ?)
-            """, (slider_values['radius'], slider_values['count'], slider_values['span'],
-                  slider_values['commit_message']))
-        cur.connection.commit()
-        logging.info('Slider values updated successfully')
-        return jsonify({'status': 'success'}), 200
+        # The parameters already computed return their commit without computing them again
+        validate_slider_values(slider_values)
+        cached = cached_result(slider_values)
+        if cached is not None:
+            return jsonify({'status': 'cached', 'commit_id': cached['commit_id'],
+                            'model_name': cached['model_name']}), 200
+
+        # The submissions of a caller (X-Client-Id or its address) are coalesced together, with
+        # ?async=true the values are queued in the background
+        client = request.headers.get('X-Client-Id') or request.remote_addr
+        if request.args.get('async', 'false').lower() == 'true':
+            submit_parameters(slider_values, wait=False, client=client)
+            return jsonify({'status': 'accepted'}), 202
+        job_id = submit_parameters(slider_values, client=client)
+        if job_id is None:
+            return jsonify({'status': 'dropped'}), 200
+        return jsonify({'status': 'success', 'job_id': job_id}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except sqlite3.Error as e:
         return jsonify({'error': 'Database error: {}'.format(e)}), 500
     except Exception as e:
         return jsonify({'error': 'Error: {}'.format(e)}), 500
 
 
-def get_slider_values(cur):
+def get_slider_values():
     try:
-        # Select the latest slider values from the table
-        cur.execute("""
-            SELECT radius, counte, span, commit_message
-            FROM slider_values
-            ORDER BY id DESC
-            LIMIT 1
-        """)
-        result = cur.fetchone()
-        if result is None:
+        # The latest slider values, cached in memory until the next write
+        slider_values = compute_db.latest_slider_values()
+        if slider_values is None:
             return jsonify({'error': 'No slider values found'}), 404
-        radius_value, counte_value, span_value, commit_message = result
-        return jsonify({'radius': radius_value, 'counte': counte_value, 'span': span_value,
-                        'commit_message': commit_message}), 200
+
+        # The id of the row is the ETag, the polls without new values get a 304
+        etag = str(slider_values['id'])
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(jsonify(slider_values), 200)
+        response.set_etag(etag)
+        return response
     except sqlite3.Error as e:
         return jsonify({'error': 'Database error: {}'.format(e)}), 500
 
@@ -142,16 +181,168 @@ def update_slider_values():
         # Handle preflight request
         return jsonify({'status': 'CORS preflight successful'}), 200
 
-    # Connect to the SQLite database
-    conn = sqlite3.connect('compute.db')
-    cur = conn.cursor()
-
     if request.method == 'POST':
-        response = post_slider_values(cur)
+        return post_slider_values()
     elif request.method == 'GET':
-        response = get_slider_values(cur)
+        return get_slider_values()
     else:
-        response = jsonify({'error': 'Invalid request method'}), 405
+        return jsonify({'error': 'Invalid request method'}), 405
+
+
+def read_batch() -> list:
+    """
+    Reads the parameter sets of a batch request: a JSON array (or an object with the array in
+    'slider-values-store') or an NDJSON stream with one set per line.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        batch = []
+        for i, line in enumerate(request.stream):
+            if line.strip():
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    raise ValueError(f'Invalid JSON in line {i + 1}')
+        return batch
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('slider-values-store')
+    return data
+
+
+@app.route('/api/slider_compute/batch', methods=['POST'])
+def post_slider_values_batch():
+    """
+    Endpoint for queueing many slider values as compute jobs in one request and one
+    transaction. The sets are read from the body, or generated over the slider ranges with
+    `?generate=grid` or `?generate=lhs&samples=<n>&seed=<seed>`. Returns the job of each set,
+    or its commit if it was already computed.
+    """
+    try:
+        generate = request.args.get('generate')
+        commit_message = request.args.get('commit_message')
+        if generate == 'grid':
+            batch = grid_parameters(commit_message)
+        elif generate == 'lhs':
+            # Checked before the sample is generated, its arrays have `samples` rows
+            try:
+                samples = int(request.args.get('samples', 100))
+                seed = int(request.args['seed']) if 'seed' in request.args else None
+            except ValueError:
+                return jsonify({'error': 'Invalid samples or seed, expected integers'}), 400
+            if not 1 <= samples <= COMPUTE_BATCH_MAX:
+                return jsonify({'error': f'Invalid samples: {samples}, expected a number '
+                                         f'between 1 and {COMPUTE_BATCH_MAX}'}), 400
+            if seed is not None and seed < 0:
+                return jsonify({'error': f'Invalid seed: {seed}, expected a non-negative '
+                                         f'integer'}), 400
+            batch = latin_hypercube_parameters(samples, seed, commit_message)
+        elif generate is not None:
+            return jsonify({'error': f'Unknown generator: {generate}'}), 400
+        else:
+            batch = read_batch()
+
+        jobs = submit_batch(batch)
+        return jsonify({'status': 'success', 'jobs': jobs}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': 'Database error: {}'.format(e)}), 500
+    except Exception as e:
+        return jsonify({'error': 'Error: {}'.format(e)}), 500
+
+
+@app.route('/api/results', methods=['POST'])
+def post_result():
+    """
+    Endpoint for the appserver to record the commit of a bake: a JSON object with its
+    `commit_id`, optionally its `model_name`, and the `slider_values_id` of the values it baked
+    (the id served by `/api/slider_compute` and its stream) or else their radius, count and
+    span. The compute job of those values ends with this commit, and the next bakes of the same
+    parameters return it instead of computing them again.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('commit_id'):
+        return jsonify({'error': 'No commit_id provided'}), 400
+    try:
+        if data.get('slider_values_id') is not None:
+            params_hash = report_commit(int(data['slider_values_id']), data['commit_id'],
+                                        data.get('model_name'))
+            if params_hash is None:
+                return jsonify({'error': 'Slider values not found'}), 404
+            return jsonify({'status': 'success', 'params_hash': params_hash}), 200
+
+        validate_slider_values(data)
+        params_hash = record_result(data, data['commit_id'], data.get('model_name'))
+        return jsonify({'status': 'success', 'params_hash': params_hash}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        return jsonify({'error': 'Database error: {}'.format(e)}), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    Endpoint with the latest compute jobs, filtered with `?status=queued|running|done|failed`
+    and limited with `?limit=` (100 by default).
+    """
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    try:
+        return jsonify({'jobs': compute_db.list_jobs(request.args.get('status'), limit)}), 200
+    except sqlite3.Error as e:
+        return jsonify({'error': 'Database error: {}'.format(e)}), 500
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id: int):
+    """
+    Endpoint with the status of a compute job.
+    """
+    try:
+        job = compute_db.get_job(job_id)
+    except sqlite3.Error as e:
+        return jsonify({'error': 'Database error: {}'.format(e)}), 500
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+
+def stream_slider_values(since_id: int):
+    """
+    Yields the server-sent events of the slider values stored after `since_id`, then of each
+    new write. The id of the row is the id of the event, so a client resumes from the last one
+    it saw. A comment is sent when nothing is written for a while to keep the connection open.
+    """
+    yield 'retry: 1000\n\n'
+    while True:
+        write_count = compute_db.write_count()
+        for slider_values in compute_db.slider_values_since(since_id):
+            since_id = slider_values['id']
+            yield f"id: {since_id}\nevent: slider_values\ndata: {json.dumps(slider_values)}\n\n"
+            write_count = None  # Read again, there may be more rows
+        if write_count is not None and \
+                not compute_db.wait_for_write(write_count, COMPUTE_STREAM_KEEPALIVE):
+            yield ': keepalive\n\n'
+
+
+@app.route('/api/slider_compute/stream', methods=['GET'])
+def slider_values_stream():
+    """
+    Server-sent events endpoint that pushes the slider values to the appserver as they are
+    stored, instead of polling `/api/slider_compute`. The stream resumes after the
+    `Last-Event-ID` header or the `since` argument, otherwise it starts with the latest values.
+    """
+    since_id = request.headers.get('Last-Event-ID', request.args.get('since'))
+    try:
+        since_id = int(since_id)
+    except (TypeError, ValueError):
+        latest = compute_db.latest_slider_values()
+        since_id = latest['id'] - 1 if latest else 0
 
-    conn.close()
-    return response
+    return Response(stream_with_context(stream_slider_values(since_id)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -1,13 +1,48 @@
 import logging
-from io import StringIO
 from typing import List, Optional
 import dash
-import plotly.express as px
 import pandas as pd
+import plotly.express as px
 
-from config.settings import UNWANTED_FIELDS
+from config.settings import UNWANTED_FIELDS, PARCOORDS_CLIENTSIDE, PARCOORDS_MAX_LINES, \
+    COMMITS_DROPDOWN_LIMIT
 from src.core_callbacks import dash_app
-from src.utils.utils_speckle import merge_commits, update_commit, models_names
+from src.utils.utils_speckle import merge_commits, embed_urls_cache, models_names, \
+    compute_models_names
+from src.utils.utils_datasets import datasets
+from src.utils.utils_filter import RangeFilterIndex, columnar_data, sample_lines, query_table
+from src.utils.utils_sync import sync_worker
+
+
+# Check if the background sync has new data
+@dash_app.callback(
+    dash.dependencies.Output('store-sync-version', 'data'),
+    [dash.dependencies.Input('sync-interval', 'n_intervals')],
+    [dash.dependencies.State('store-sync-version', 'data')]
+)
+def update_sync_version(n_intervals, current_version):
+    version, _, _ = sync_worker.snapshot()
+    if version == current_version:
+        raise dash.exceptions.PreventUpdate
+    return version
+
+
+# Refresh the models once the background sync has listed them (the page may be served from the
+# names cached by the previous run)
+@dash_app.callback(
+    [dash.dependencies.Output('dropdown-branches', 'options'),
+     dash.dependencies.Output('dropdown-compute-data', 'options')],
+    [dash.dependencies.Input('sync-interval', 'n_intervals')],
+    [dash.dependencies.State('dropdown-branches', 'options'),
+     dash.dependencies.State('dropdown-compute-data', 'options')]
+)
+def update_models_options(n_intervals, models_options, compute_models_options):
+    new_models_options = [{'label': i, 'value': i} for i in models_names]
+    new_compute_models_options = [{'label': i, 'value': i} for i in compute_models_names]
+    if new_models_options == models_options and \
+            new_compute_models_options == compute_models_options:
+        raise dash.exceptions.PreventUpdate
+    return new_models_options, new_compute_models_options
 
 
 # Callback related with dropdown and sidebar interactions
@@ -15,132 +50,365 @@ from src.utils.utils_speckle import merge_commits, update_commit, models_names
     [dash.dependencies.Output('store-branches', 'data'),
      dash.dependencies.Output('store-branches-attributes', 'data')],
     [dash.dependencies.Input('speckle-data-sidebar', 'n_clicks'),
-     dash.dependencies.Input("dropdown-branches", "value")]
+     dash.dependencies.Input("dropdown-branches", "value"),
+     dash.dependencies.Input('store-sync-version', 'data')]
     # [dash.dependencies.State("collapse", "is_open")]
 )
-def update_data(n_clicks, dropdown_models):
-    selected_model = next(
-        (model for model in models_names if model.startswith('compute/')), None)
-    selected_model = [selected_model] if not isinstance(selected_model,
-                                                        list) else selected_model
-    selected_commit_metadata, selected_commit_data = update_commit(selected_model)
-    if selected_commit_metadata is not None and selected_commit_data is not None:
-        data_store_branches = selected_commit_metadata.to_json(
-            date_format='iso', orient='split')
-        data_store_branches_attributes = selected_commit_data.to_json(
-            date_format='iso', orient='split')
+def update_data(n_clicks, dropdown_models, sync_version):
+    """
+    Returns the keys of the latest snapshot of the background sync, the data stays in the
+    server-side dataset registry. Opening the sidebar asks for a new sync, its data arrives
+    through the sync version.
+    """
+    ctx = dash.callback_context
+    if ctx.triggered and ctx.triggered[0]['prop_id'].startswith('speckle-data-sidebar'):
+        sync_worker.request_sync()
 
-        return data_store_branches, data_store_branches_attributes
+    version, _, _ = sync_worker.snapshot()
+    if not version:
+        return None, None
+    return datasets.key('commits', version), datasets.key('attributes', version)
 
 
 # Merge the selected commits and update the iframe
 @dash_app.callback(
     dash.dependencies.Output("speckle-iframe", "src"),
     [dash.dependencies.Input("dropdown-branches", "value"),
-     dash.dependencies.Input("dropdown-commit", "value")],
+     dash.dependencies.Input("dropdown-commit", "value"),
+     dash.dependencies.Input("store-cached-commit", "data")],
 )
-def update_latest_commit(dropdown_models: Optional[List[str]] = None, dropdown_commit=None) -> str:
+def update_latest_commit(dropdown_models: Optional[List[str]] = None, dropdown_commit=None,
+                         cached_commit: Optional[dict] = None) -> str:
+    # A bake of parameters already computed shows their commit
+    ctx = dash.callback_context
+    commits_model = None
+    if cached_commit and ctx.triggered and \
+            ctx.triggered[0]['prop_id'].startswith('store-cached-commit'):
+        dropdown_commit = cached_commit['commit_id']
+        commits_model = cached_commit.get('model_name')
+
     # Merge the latest commits given the model or the selected commits
-    merged_url = merge_commits(dropdown_models, dropdown_commit)
+    key = (tuple(dropdown_models or []),
+           tuple(dropdown_commit) if isinstance(dropdown_commit, list) else dropdown_commit,
+           commits_model)
+    merged_url = embed_urls_cache.get_or_set(
+        key, lambda: merge_commits(list(dropdown_models or []), dropdown_commit, commits_model))
     return merged_url
 
 
-# Update the parcoords plot based on the original data
+def parcoords_figure(df_obj_data: pd.DataFrame, df_lines: pd.DataFrame,
+                     constraints: Optional[dict] = None) -> dict:
+    """
+    Builds the parallel coordinates figure of the lines of a dataset. When only part of the
+    lines are drawn the axes keep the ranges of the whole dataset, and the figure is flagged
+    in `layout.meta.lod` so the browser sends its brushing to the server.
+    """
+    fig = px.parallel_coordinates(df_lines, dimensions=df_lines.columns)
+    if len(df_lines) < len(df_obj_data):
+        fig.update_layout(meta={'lod': True})
+        # Keep the axes of the whole dataset and the brushed ranges of the previous plot
+        for dimension in fig.data[0].dimensions:
+            if dimension.label in df_obj_data and \
+                    pd.api.types.is_numeric_dtype(df_obj_data[dimension.label]):
+                dimension.range = [df_obj_data[dimension.label].min(),
+                                   df_obj_data[dimension.label].max()]
+            if constraints and dimension.label in constraints:
+                ranges = constraints[dimension.label]
+                dimension.constraintrange = ranges[0] if len(ranges) == 1 else ranges
+    return fig.to_dict()
+
+
+def lod_figure(df_obj_data: pd.DataFrame) -> dict:
+    """
+    Builds the figure of a dataset version, with a sample of its lines past
+    `PARCOORDS_MAX_LINES`.
+    """
+    df_sample = sample_lines(df_obj_data, PARCOORDS_MAX_LINES).drop(columns=UNWANTED_FIELDS)
+    if df_sample.empty:
+        return {}
+    return parcoords_figure(df_obj_data, df_sample)
+
+
+def append_patch(rendered_data: Optional[str], selected_commit_data: str) -> Optional[dash.Patch]:
+    """
+    Returns the partial update of the drawn figure if the new dataset version only appends
+    commits to the drawn one and every line is drawn, or None if the figure must be replaced.
+    """
+    df_drawn = datasets.get(rendered_data)
+    df_obj_data = datasets.get(selected_commit_data)
+    if df_drawn is None or df_obj_data is None or len(df_obj_data) <= len(df_drawn):
+        return None
+    if 0 < PARCOORDS_MAX_LINES < len(df_obj_data):
+        return None
+    if not df_obj_data.columns.equals(df_drawn.columns) or \
+            not df_obj_data.index[:len(df_drawn)].equals(df_drawn.index):
+        return None
+
+    drawn_figure = datasets.derived(rendered_data, 'figure', lod_figure)
+    if not drawn_figure:
+        return None
+    df_new = df_obj_data.iloc[len(df_drawn):]
+    patch = dash.Patch()
+    for i, dimension in enumerate(drawn_figure['data'][0]['dimensions']):
+        patch['data'][0]['dimensions'][i]['values'].extend(df_new[dimension['label']].tolist())
+    return patch
+
+
+# Update the parcoords plot based on the original data, past `PARCOORDS_MAX_LINES` rows only a
+# sample is drawn and the lines inside the brushed ranges are added to it, also up to
+# `PARCOORDS_MAX_LINES` (a larger selection is sampled too). The figure of each dataset version
+# is built once, and the commits added by a sync are appended to the drawn one
 @dash_app.callback(
-    dash.dependencies.Output('parcoords-plot', 'figure'),
-    [dash.dependencies.Input('store-branches-attributes', 'data')]
+    [dash.dependencies.Output('parcoords-plot', 'figure'),
+     dash.dependencies.Output('store-parcoords-data', 'data')],
+    [dash.dependencies.Input('store-branches-attributes', 'data'),
+     dash.dependencies.Input('store-lod-constraints', 'data')],
+    [dash.dependencies.State('store-parcoords-data', 'data')]
 )
-def update_parallel_plot(selected_commit_data):
+def update_parallel_plot(selected_commit_data, lod_constraints=None, rendered_data=None):
     """
     Updates the parallel coordinates plot based on the original data.
     """
     try:
         if selected_commit_data is None:
-            return {}
-        df_obj_data = pd.read_json(StringIO(selected_commit_data), orient='split')
-        df_obj_data = df_obj_data.drop(columns=UNWANTED_FIELDS)
-        if df_obj_data.empty:
-            return {}
-        else:
-            fig = px.parallel_coordinates(df_obj_data, dimensions=df_obj_data.columns)
-            return fig
+            return {}, None
+        df_obj_data = datasets.get(selected_commit_data)
+        if df_obj_data is None:
+            return {}, None
+
+        ctx = dash.callback_context
+        brushed = bool(ctx.triggered) and \
+            ctx.triggered[0]['prop_id'].startswith('store-lod-constraints')
+        if not brushed:
+            if selected_commit_data == rendered_data:
+                raise dash.exceptions.PreventUpdate
+            patch = append_patch(rendered_data, selected_commit_data)
+            if patch is not None:
+                return patch, selected_commit_data
+            return datasets.derived(selected_commit_data, 'figure', lod_figure), \
+                selected_commit_data
 
+        # Brushing only redraws the plot if the dataset doesn't fit in one plot
+        if PARCOORDS_MAX_LINES <= 0 or len(df_obj_data) <= PARCOORDS_MAX_LINES:
+            raise dash.exceptions.PreventUpdate
+
+        df_sample = datasets.derived(
+            selected_commit_data, 'lod_sample',
+            lambda df: sample_lines(df, PARCOORDS_MAX_LINES).drop(columns=UNWANTED_FIELDS))
+        if lod_constraints:
+            filter_index = datasets.derived(selected_commit_data, 'range_index', RangeFilterIndex)
+            df_brushed = sample_lines(filter_index.filter(lod_constraints), PARCOORDS_MAX_LINES)
+            df_sample = pd.concat([df_sample, df_brushed.drop(columns=UNWANTED_FIELDS)])
+            df_sample = df_sample[~df_sample.index.duplicated()]
+        return parcoords_figure(df_obj_data, df_sample, lod_constraints), selected_commit_data
+
+    except dash.exceptions.PreventUpdate:
+        raise
     except Exception as e:
         logging.error(e)
-        return {}
+        return {}, None
 
 
-# Update the table based on interactions with the parcoords plot
-@dash_app.callback(
-    [dash.dependencies.Output('filtered-table', 'data'),
-     dash.dependencies.Output('dropdown-commit', 'options')],
+# Keep the brushed ranges of the parcoords plot, read in the browser so the figure is never
+# sent to the server. A redrawn figure drops them, a figure patched with new commits keeps
+# them. The brushing of a sampled figure is also sent to `store-lod-constraints`, the only
+# brushing that reaches the server when the table is filtered in the browser
+CLIENTSIDE_UPDATE_CONSTRAINTS = """
+function(restyleData, figure, currentConstraints) {
+    var noUpdate = window.dash_clientside.no_update;
+    var constraints = {};
+    var dimensions = (figure && figure.data && figure.data.length) ?
+        (figure.data[0].dimensions || []) : [];
+    dimensions.forEach(function(dimension) {
+        var ranges = dimension.constraintrange;
+        if (dimension.label && ranges && ranges.length) {
+            // A single selection range or a list of ranges
+            constraints[dimension.label] = Array.isArray(ranges[0]) ? ranges : [ranges];
+        }
+    });
+    if (JSON.stringify(constraints) === JSON.stringify(currentConstraints || {})) {
+        return [noUpdate, noUpdate];
+    }
+
+    var triggered = window.dash_clientside.callback_context.triggered || [];
+    var brushed = triggered.some(function(t) {
+        return t.prop_id === 'parcoords-plot.restyleData';
+    });
+    var lod = Boolean(figure && figure.layout && figure.layout.meta && figure.layout.meta.lod);
+    return [constraints, brushed && lod ? constraints : noUpdate];
+}
+"""
+
+dash_app.clientside_callback(
+    CLIENTSIDE_UPDATE_CONSTRAINTS,
+    [dash.dependencies.Output('store-constraints', 'data'),
+     dash.dependencies.Output('store-lod-constraints', 'data')],
     [dash.dependencies.Input('parcoords-plot', 'restyleData'),
-     dash.dependencies.Input('store-branches', 'data'),
-     dash.dependencies.Input('store-branches-attributes', 'data')],
-    [dash.dependencies.State('parcoords-plot', 'figure')]
+     dash.dependencies.Input('parcoords-plot', 'figure')],
+    [dash.dependencies.State('store-constraints', 'data')]
 )
-def update_table(restyleData, selected_commit_metadata, selected_commit_data, figure):
+
+
+def filtered_commits(selected_commit_data: Optional[str], constraints: Optional[dict]) -> list:
+    """
+    Returns the ids of the commits of a dataset version inside the brushed ranges.
     """
-    Updates the table data and dropdown options based on the selected data in the parallel plot.
+    df_obj_data = datasets.get(selected_commit_data)
+    if df_obj_data is None or df_obj_data.empty:
+        return []
+    if constraints:
+        # Filter the data based on the selected ranges with the index of the dataset version
+        filter_index = datasets.derived(selected_commit_data, 'range_index', RangeFilterIndex)
+        df_obj_data = filter_index.filter(constraints)
+    return df_obj_data['commitId'].unique().tolist()
+
+
+# Update the page of the table based on the brushed ranges and the sort and filter of the table
+def update_table(constraints, selected_commit_metadata, selected_commit_data, page_current,
+                 page_size, sort_by, filter_query):
+    """
+    Returns the visible page of the commits inside the brushed ranges of the parallel plot.
     """
     try:
-        if selected_commit_metadata is None or selected_commit_data is None:
-            return [], []
-
-        # Convert JSON strings to DataFrames
-        df_commit_metadata = pd.read_json(StringIO(selected_commit_metadata), orient='split')
-        df_obj_data = pd.read_json(StringIO(selected_commit_data), orient='split')
-        df_obj_data = df_obj_data.drop(columns=UNWANTED_FIELDS, errors='ignore')
-
-        if df_commit_metadata.empty or df_obj_data.empty:
-            return [], []
-
-        # If no data is selected, return the original data
-        if not restyleData or not figure or 'data' not in figure or len(figure['data']) == 0:
-            table_data_original = df_commit_metadata.to_dict('records')
-            dropdown_commits_original = [{'label': i, 'value': i} for i in
-                                         df_obj_data['commitId'].unique()]
-            return table_data_original, dropdown_commits_original
-
-        # Filter the data based on the selected ranges
-        filtered_df = df_obj_data.copy()
-
-        # Iterate over the dimensions to apply filters
-        for dim_data in figure['data'][0]['dimensions']:
-            dim_label = dim_data.get('label')
-            dim_range = dim_data.get('constraintrange')
-
-            if dim_label and dim_range:
-                if isinstance(dim_range[0], list):  # Handle multiple selection ranges
-                    mask = pd.Series([False] * len(filtered_df))
-                    for r in dim_range:
-                        mask |= (filtered_df[dim_label] >= r[0]) & (filtered_df[dim_label] <= r[1])
-                    filtered_df = filtered_df[mask]
-                else:  # Single selection range
-                    filtered_df = filtered_df[
-                        (filtered_df[dim_label] >= dim_range[0]) &
-                        (filtered_df[dim_label] <= dim_range[1])
-                        ]
+        df_commit_metadata = datasets.get(selected_commit_metadata)
+        if df_commit_metadata is None or df_commit_metadata.empty:
+            return [], 1, 0
 
         # Filter the commit metadata based on the filtered commit IDs
-        table_data = df_commit_metadata[
-            df_commit_metadata['commitId'].isin(filtered_df['commitId'])].to_dict('records')
-        dropdown_commits = [{'label': i, 'value': i} for i in filtered_df['commitId'].unique()]
+        commit_ids = filtered_commits(selected_commit_data, constraints)
+        df_table = df_commit_metadata[df_commit_metadata['commitId'].isin(commit_ids)]
+        df_table = query_table(df_table, filter_query, sort_by)
+
+        page_size = page_size or 1
+        page_count = max(1, -(-len(df_table) // page_size))
+        page_current = min(page_current or 0, page_count - 1)
+        page = df_table.iloc[page_current * page_size: (page_current + 1) * page_size]
+        return page.to_dict('records'), page_count, page_current
+
+    except Exception as e:
+        logging.exception(e)
+        return [], 1, 0
+
+
+# Search the commits of the dropdown in the server, only the first matches are sent
+def update_commit_options(search_value, constraints, selected_commit_data, selected_commit):
+    """
+    Returns the dropdown options of the commits inside the brushed ranges that match the search.
+    """
+    try:
+        commit_ids = filtered_commits(selected_commit_data, constraints)
+        if search_value:
+            commit_ids = [i for i in commit_ids if search_value.lower() in i.lower()]
+        options = [{'label': i, 'value': i} for i in commit_ids[:COMMITS_DROPDOWN_LIMIT]]
+        # Keep the selected commit even if it doesn't match the search
+        if selected_commit and selected_commit not in commit_ids[:COMMITS_DROPDOWN_LIMIT]:
+            options.insert(0, {'label': selected_commit, 'value': selected_commit})
+        return options
+
+    except Exception as e:
+        logging.exception(e)
+        return []
 
-        return table_data, dropdown_commits
+
+# Send the compact columnar copy of the dataset version to the browser, once per version
+def update_columnar_store(selected_commit_metadata, selected_commit_data):
+    """
+    Returns the columnar copy of the selected dataset version used by the clientside filter.
+    """
+    try:
+        df_commit_metadata = datasets.get(selected_commit_metadata)
+        if df_commit_metadata is None or datasets.get(selected_commit_data) is None:
+            return None
+        return datasets.derived(
+            selected_commit_data, 'columnar',
+            lambda df: columnar_data(df_commit_metadata,
+                                     df.drop(columns=UNWANTED_FIELDS, errors='ignore')))
 
     except Exception as e:
         logging.exception(e)
-        return [], []
-
-
-# # Callback to extract quantities data about the selected commit
-# @dash_app.callback(
-#     [dash.dependencies.Output("quantities-graph", "src"),
-#      dash.dependencies.Output("quantities-table", "data")],
-#     [dash.dependencies.Input("speckle-data-count", "value"),
-#      dash.dependencies.Input("dropdown-commit", "value")],
-# )
-# def update_latest_commit(quantities_graph, quantities_table):
-#     # Given a commitId extract the number of elements by type
-#     pass
+        return None
+
+
+# Same filter as the server callbacks, applied to the columnar copy without a server round trip
+CLIENTSIDE_UPDATE_TABLE = """
+function(restyleData, columnar, figure) {
+    if (!columnar || !columnar.commitId.length) {
+        return [[], []];
+    }
+    var commitIds = columnar.commitId;
+    var keep = new Array(commitIds.length).fill(true);
+    var dimensions = (restyleData && figure && figure.data && figure.data.length) ?
+        (figure.data[0].dimensions || []) : [];
+
+    dimensions.forEach(function(dimension) {
+        var ranges = dimension.constraintrange;
+        var values = columnar.dimensions[dimension.label];
+        if (!ranges || !ranges.length || !values) {
+            return;
+        }
+        // A single selection range or a list of ranges
+        if (!Array.isArray(ranges[0])) {
+            ranges = [ranges];
+        }
+        for (var i = 0; i < values.length; i++) {
+            if (!keep[i]) {
+                continue;
+            }
+            var value = values[i];
+            var inside = false;
+            for (var r = 0; value !== null && r < ranges.length && !inside; r++) {
+                inside = value >= ranges[r][0] && value <= ranges[r][1];
+            }
+            keep[i] = inside;
+        }
+    });
+
+    var selected = {};
+    var dropdownCommits = [];
+    for (var j = 0; j < commitIds.length; j++) {
+        if (keep[j] && !selected[commitIds[j]]) {
+            selected[commitIds[j]] = true;
+            dropdownCommits.push({'label': commitIds[j], 'value': commitIds[j]});
+        }
+    }
+    var tableData = columnar.commits.filter(function(row) {
+        return selected[row.commitId];
+    });
+    return [tableData, dropdownCommits];
+}
+"""
+
+if PARCOORDS_CLIENTSIDE:
+    dash_app.callback(
+        dash.dependencies.Output('store-columnar', 'data'),
+        [dash.dependencies.Input('store-branches', 'data'),
+         dash.dependencies.Input('store-branches-attributes', 'data')]
+    )(update_columnar_store)
+    dash_app.clientside_callback(
+        CLIENTSIDE_UPDATE_TABLE,
+        [dash.dependencies.Output('filtered-table', 'data'),
+         dash.dependencies.Output('dropdown-commit', 'options')],
+        [dash.dependencies.Input('parcoords-plot', 'restyleData'),
+         dash.dependencies.Input('store-columnar', 'data')],
+        [dash.dependencies.State('parcoords-plot', 'figure')]
+    )
+else:
+    dash_app.callback(
+        [dash.dependencies.Output('filtered-table', 'data'),
+         dash.dependencies.Output('filtered-table', 'page_count'),
+         dash.dependencies.Output('filtered-table', 'page_current')],
+        [dash.dependencies.Input('store-constraints', 'data'),
+         dash.dependencies.Input('store-branches', 'data'),
+         dash.dependencies.Input('store-branches-attributes', 'data'),
+         dash.dependencies.Input('filtered-table', 'page_current'),
+         dash.dependencies.Input('filtered-table', 'page_size'),
+         dash.dependencies.Input('filtered-table', 'sort_by'),
+         dash.dependencies.Input('filtered-table', 'filter_query')]
+    )(update_table)
+    dash_app.callback(
+        dash.dependencies.Output('dropdown-commit', 'options'),
+        [dash.dependencies.Input('dropdown-commit', 'search_value'),
+         dash.dependencies.Input('store-constraints', 'data'),
+         dash.dependencies.Input('store-branches-attributes', 'data')],
+        [dash.dependencies.State('dropdown-commit', 'value')]
+    )(update_commit_options)
@@ -23,6 +23,7 @@ handler = logging.StreamHandler()
 formatter = ColoredFormatter('%(levelname)s - %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
+logger.setLevel(logging.INFO)
 
 # Suppress all Speckle-related logs
 for logger_name in logging.root.manager.loggerDict:
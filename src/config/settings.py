@@ -16,6 +16,24 @@ SPECKLE_MODEL_ID = os.getenv("SPECKLE_MODEL_ID")
 SPECKLE_INITIAL_COMMIT_ID = os.getenv("SPECKLE_INITIAL_COMMIT_ID")
 MODEL_TESTING = os.getenv("MODEL_TESTING")
 UNWANTED_FIELDS = ['id', 'totalChildrenCount', 'applicationId']
+SPECKLE_FETCH_WORKERS = int(os.getenv("SPECKLE_FETCH_WORKERS", 8))  # 1 = sequential download
+SPECKLE_FETCH_TIMEOUT = float(os.getenv("SPECKLE_FETCH_TIMEOUT", 120))  # seconds per commit
+SPECKLE_MODELS_LIMIT = int(os.getenv("SPECKLE_MODELS_LIMIT", 100))
+SPECKLE_COMMITS_PAGE_SIZE = int(os.getenv("SPECKLE_COMMITS_PAGE_SIZE", 100))
+SPECKLE_COMMITS_MAX = int(os.getenv("SPECKLE_COMMITS_MAX", 0))  # 0 = whole history
+SPECKLE_PARTIAL_RECEIVE = os.getenv("SPECKLE_PARTIAL_RECEIVE", "true").lower() == "true"
+SPECKLE_MODELS_TTL = float(os.getenv("SPECKLE_MODELS_TTL", 30))  # seconds
+SPECKLE_SYNC_INTERVAL = float(os.getenv("SPECKLE_SYNC_INTERVAL", 60))  # seconds between syncs
+SPECKLE_SYNC_POLL_MS = int(os.getenv("SPECKLE_SYNC_POLL_MS", 5000))  # UI version checks
+DATASETS_MAX_ENTRIES = int(os.getenv("DATASETS_MAX_ENTRIES", 8))  # DataFrames kept in memory
+# Filter the brushed ranges in the browser (small and medium datasets)
+PARCOORDS_CLIENTSIDE = os.getenv("PARCOORDS_CLIENTSIDE", "false").lower() == "true"
+# Lines drawn, and lines added inside the brushed ranges of a sampled plot. 0 = every line
+PARCOORDS_MAX_LINES = int(os.getenv("PARCOORDS_MAX_LINES", 2000))
+PARCOORDS_LOD_BINS = int(os.getenv("PARCOORDS_LOD_BINS", 4))  # quantile bins per attribute
+COMMITS_DROPDOWN_LIMIT = int(os.getenv("COMMITS_DROPDOWN_LIMIT", 50))  # options per search
+SPECKLE_CACHE_PATH = os.getenv("SPECKLE_CACHE_PATH", "speckle_cache.db")
+SPECKLE_CACHE_MAX_MB = int(os.getenv("SPECKLE_CACHE_MAX_MB", 2048))
 
 # Compute
 CORS_IPS = {
@@ -29,3 +47,27 @@ COMPUTE_PATHS = {
     "compute": os.getenv("COMPUTE_GEOMETRY_PATH"),
 }
 COMPUTE_SCRIPTS = ['Dolcker/CeramicFacade']
+# Readiness probes of the supervised processes, an http(s) url or tcp://host:port
+COMPUTE_PROBE_URL = os.getenv("COMPUTE_PROBE_URL", "http://localhost:6500/healthcheck")
+APPSERVER_PROBE_URL = os.getenv("APPSERVER_PROBE_URL", "tcp://localhost:3000")
+SUPERVISOR_READY_TIMEOUT = float(os.getenv("SUPERVISOR_READY_TIMEOUT", 120))  # seconds
+SUPERVISOR_MAX_BACKOFF = float(os.getenv("SUPERVISOR_MAX_BACKOFF", 60))  # seconds
+# Seconds a child without a probe runs before it counts as ready
+SUPERVISOR_READY_AFTER = float(os.getenv("SUPERVISOR_READY_AFTER", 10))
+COMPUTE_SLIDERS = {  # Ranges of the compute parameters, shared by the sliders and the API
+    "count": {"min": 0, "max": 20, "step": 1, "value": 10},
+    "radius": {"min": 0, "max": 20, "step": 1, "value": 3},
+    "span": {"min": 0, "max": 20, "step": 1, "value": 3},
+}
+COMPUTE_BATCH_MAX = int(os.getenv("COMPUTE_BATCH_MAX", 10000))  # parameter sets per request
+# Jobs run at once, the appserver only bakes the latest slider values
+COMPUTE_JOB_WORKERS = int(os.getenv("COMPUTE_JOB_WORKERS", 1))
+COMPUTE_JOB_TIMEOUT = float(os.getenv("COMPUTE_JOB_TIMEOUT", 600))  # seconds to get the commit
+COMPUTE_JOB_POLL = float(os.getenv("COMPUTE_JOB_POLL", 2))  # seconds between checks
+COMPUTE_DB_PATH = os.getenv("COMPUTE_DB_PATH", "compute.db")
+COMPUTE_DB_POOL_SIZE = int(os.getenv("COMPUTE_DB_POOL_SIZE", 8))  # open connections at most
+COMPUTE_STREAM_KEEPALIVE = float(os.getenv("COMPUTE_STREAM_KEEPALIVE", 15))  # seconds
+COMPUTE_DEBOUNCE_MS = int(os.getenv("COMPUTE_DEBOUNCE_MS", 800))  # browser wait before a bake
+COMPUTE_SETTLE_SECONDS = float(os.getenv("COMPUTE_SETTLE_SECONDS", 0.5))  # newer values win
+COMPUTE_DEDUP_WINDOW = float(os.getenv("COMPUTE_DEDUP_WINDOW", 30))  # seconds
+COMPUTE_SUBMIT_WORKERS = int(os.getenv("COMPUTE_SUBMIT_WORKERS", 4))  # background submissions
@@ -1,42 +1,29 @@
-import subprocess
-
 import openai
 import logging
 
-from src.config.settings import OPENAI_API_KEY, COMPUTE_PATHS
+from src.config.settings import OPENAI_API_KEY
+from src.utils.utils_supervisor import supervisor
 
 
 def start_compute():
     """
-    Starts the compute.geometry project in a separate process.
+    Starts the compute.geometry project in a separate process, kept running by the supervisor.
     """
-    compute_path = COMPUTE_PATHS['compute']
-
-    try:
-        subprocess.Popen(compute_path, shell=True)
-        logging.info('Started compute.geometry')
-    except FileNotFoundError:
-        logging.error(f"Failed to start compute.geometry. File not found: {compute_path}")
-    except Exception as e:
-        logging.error(f"Failed to start compute.geometry. Error: {str(e)}")
+    if 'compute' not in supervisor.children:
+        logging.error('Failed to start compute.geometry. COMPUTE_GEOMETRY_PATH is not set')
+        return
+    supervisor.start(['compute'])
 
 
 def start_appserver():
     """
     Starts the other project in a separate process. This is needed because the other project is a
-    node.js project.
+    node.js project. It is kept running by the supervisor.
     """
-    node_path = COMPUTE_PATHS['node']
-    npm_path = COMPUTE_PATHS['npm']
-    appserver_path = COMPUTE_PATHS['appserver']
-
-    try:
-        subprocess.Popen([node_path, npm_path, 'start'], cwd=appserver_path, shell=True)
-        logging.info('Started appserver')
-    except FileNotFoundError:
-        logging.error(f"Failed to start appserver. File not found: {appserver_path}")
-    except Exception as e:
-        logging.error(f"Failed to start appserver. Error: {str(e)}")
+    if 'appserver' not in supervisor.children:
+        logging.error('Failed to start appserver. APPSERVER_PATH, NODE_PATH or NPM_PATH is not set')
+        return
+    supervisor.start(['appserver'])
 
 
 # Random commit message suggestion
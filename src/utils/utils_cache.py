@@ -0,0 +1,334 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from specklepy.logging.exceptions import SpeckleException
+from specklepy.transports.abstract_transport import AbstractTransport
+
+from config.settings import SPECKLE_CACHE_PATH, SPECKLE_CACHE_MAX_MB
+
+SQLITE_MAX_VARIABLES = 900  # Keep the IN (...) clauses below the sqlite limit
+
+
+class ObjectCacheTransport(AbstractTransport):
+    """
+    Disk-backed, content-addressed cache of Speckle objects. Objects are immutable and keyed by
+    their id (hash), so anything that is received once is never downloaded again, even after a
+    restart. The least recently used objects are evicted when the cache grows over `max_bytes`.
+
+    It is meant to be used as the local transport of `operations.receive`, in front of the
+    `ServerTransport`.
+
+    Args:
+        path (str, optional): The path of the database file.
+        max_bytes (int, optional): Size of the cached objects past which they are evicted.
+        source (Callable[[], AbstractTransport], optional): Returns the transport the trees
+            missing from the cache are copied from, e.g. the `ServerTransport` of the project.
+    """
+
+    def __init__(self, path: str = SPECKLE_CACHE_PATH,
+                 max_bytes: int = SPECKLE_CACHE_MAX_MB * 1024 * 1024,
+                 source: Optional[Callable[[], AbstractTransport]] = None) -> None:
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.source = source
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        self._initialise()
+        self._size = self.size()  # Upper bound of the size, corrected before evicting
+
+    def __repr__(self) -> str:
+        return f"ObjectCacheTransport(path: {self.path}, max_bytes: {self.max_bytes})"
+
+    @property
+    def name(self) -> str:
+        return "ObjectCache"
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # One connection per thread, the commits are received concurrently
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+        return conn
+
+    def _initialise(self) -> None:
+        with self.connection as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS objects_last_access "
+                         "ON objects (last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS commit_attributes (
+                    commit_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+
+    # Transport interface
+    def begin_write(self) -> None:
+        self._local.batch = []
+
+    def end_write(self) -> None:
+        batch = getattr(self._local, 'batch', None) or []
+        self._local.batch = []
+        if batch:
+            self._write(batch)
+        self.evict()
+
+    def save_object(self, id: str, serialized_object: str) -> None:
+        batch = getattr(self._local, 'batch', None)
+        if batch is None:
+            self._write([(id, serialized_object)])
+        else:
+            batch.append((id, serialized_object))
+
+    def save_object_from_transport(self, id: str, source_transport: AbstractTransport) -> None:
+        self.save_object(id, source_transport.get_object(id))
+
+    def get_object(self, id: str) -> Optional[str]:
+        row = self.connection.execute("SELECT data FROM objects WHERE id = ?",
+                                      (id,)).fetchone()
+        return row[0] if row else None
+
+    def get_objects(self, id_list: List[str]) -> Dict[str, str]:
+        """
+        Gets the cached objects of a list of ids and marks them as recently used, the missing
+        ones are not in the result.
+        """
+        found = {}
+        now = time.time()
+        with self.connection as conn:
+            for chunk in _chunks(id_list):
+                placeholders = ','.join('?' * len(chunk))
+                found.update(conn.execute(
+                    f"SELECT id, data FROM objects WHERE id IN ({placeholders})",
+                    chunk).fetchall())
+                conn.execute(f"UPDATE objects SET last_access = ? WHERE id IN ({placeholders})",
+                             [now, *chunk])
+        return found
+
+    def has_objects(self, id_list: List[str]) -> Dict[str, bool]:
+        found = set()
+        for chunk in _chunks(id_list):
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT id FROM objects WHERE id IN ({placeholders})", chunk).fetchall()
+            found.update(row[0] for row in rows)
+        return {id: id in found for id in id_list}
+
+    def copy_object_and_children(self, id: str, target_transport: AbstractTransport) -> str:
+        """
+        Copies an object and its children (`__closure`) to another transport. A tree missing
+        from the cache, or partially evicted, is first copied to the cache from `source`.
+
+        Args:
+            id (str): The id of the root object.
+            target_transport (AbstractTransport): The transport the objects are copied to.
+
+        Returns:
+            str: The serialized root object.
+        """
+        if not self.is_complete(id):
+            if self.source is None:
+                raise SpeckleException(f'Object {id} is not in the cache and there is no source '
+                                       f'transport to copy it from')
+            self.source().copy_object_and_children(id, self)
+
+        root_obj_serialized = self.get_object(id)
+        children_ids = list(json.loads(root_obj_serialized).get('__closure', {}).keys())
+        objects = self.get_objects(children_ids)
+        missing_ids = [child_id for child_id in children_ids if child_id not in objects]
+        if missing_ids:
+            raise SpeckleException(f'{len(missing_ids)} children of {id} are not in the cache')
+
+        target_transport.begin_write()
+        for child_id in children_ids:
+            target_transport.save_object(child_id, objects[child_id])
+        target_transport.save_object(id, root_obj_serialized)
+        target_transport.end_write()
+        return root_obj_serialized
+
+    # Cache management
+    def is_complete(self, id: str) -> bool:
+        """
+        Checks that an object and all its children are in the cache and marks them as recently
+        used. A tree may be partially evicted, in that case it has to be received again.
+
+        Args:
+            id (str): The id of the root object.
+
+        Returns:
+            bool: True if the whole tree is cached.
+        """
+        obj_string = self.get_object(id)
+        if obj_string is None:
+            return False
+
+        ids = [id] + list(json.loads(obj_string).get('__closure', {}).keys())
+        touched = 0
+        now = time.time()
+        with self.connection as conn:
+            for chunk in _chunks(ids):
+                placeholders = ','.join('?' * len(chunk))
+                touched += conn.execute(
+                    f"UPDATE objects SET last_access = ? WHERE id IN ({placeholders})",
+                    [now, *chunk]).rowcount
+        return touched == len(ids)
+
+    def size(self) -> int:
+        """
+        Returns the number of bytes of the cached objects.
+        """
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used objects until the cache fits in `max_bytes`.
+        """
+        with self._size_lock:
+            if self._size <= self.max_bytes:
+                return
+            self._size = self.size()
+            excess = self._size - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        for obj_id, size in self.connection.execute(
+                "SELECT id, size FROM objects ORDER BY last_access"):
+            evicted.append(obj_id)
+            excess -= size
+            if excess <= 0:
+                break
+
+        with self.connection as conn:
+            for chunk in _chunks(evicted):
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(f"DELETE FROM objects WHERE id IN ({placeholders})", chunk)
+        with self._size_lock:
+            self._size = self.size()
+        logging.info(f'Evicted {len(evicted)} objects from the Speckle cache')
+
+    def _write(self, batch: list) -> None:
+        now = time.time()
+        rows = [(obj_id, data, len(data), now) for obj_id, data in batch]
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO objects (id, data, size, last_access) "
+                "VALUES (?, ?, ?, ?)", rows)
+        with self._size_lock:
+            self._size += sum(row[2] for row in rows)
+
+    # Aggregated attributes of the commits
+    def get_attributes(self, commit_ids: List[str]) -> Dict[str, dict]:
+        """
+        Returns the aggregated attributes stored for a list of commits, the commits that were
+        never stored are not in the result.
+        """
+        found = {}
+        for chunk in _chunks(commit_ids):
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT commit_id, data FROM commit_attributes "
+                f"WHERE commit_id IN ({placeholders})", chunk).fetchall()
+            found.update({commit_id: json.loads(data) for commit_id, data in rows})
+        return found
+
+    def save_attributes(self, attributes: Dict[str, dict]) -> None:
+        """
+        Stores the aggregated attributes of each commit.
+        """
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO commit_attributes (commit_id, data) VALUES (?, ?)",
+                [(commit_id, json.dumps(values, default=_to_json))
+                 for commit_id, values in attributes.items()])
+
+    # Small values kept between runs (e.g. the names of the models for a warm start)
+    def get_value(self, key: str) -> Any:
+        row = self.connection.execute("SELECT value FROM metadata WHERE key = ?",
+                                      (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_value(self, key: str, value: Any) -> None:
+        with self.connection as conn:
+            conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value, default=_to_json)))
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire after `ttl` seconds. Entries can also be
+    invalidated explicitly when the cached data is known to have changed.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return default
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of the key, or computes it with `func` and caches it. Falsy
+        values are not cached.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = func()
+            if value:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Removes a key, or every entry if no key is given.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def _to_json(value):
+    # numpy scalars produced by the aggregations
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def _chunks(items: list, size: int = SQLITE_MAX_VARIABLES):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
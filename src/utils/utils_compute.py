@@ -0,0 +1,272 @@
+import itertools
+import logging
+import numbers
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from config.settings import COMPUTE_SETTLE_SECONDS, COMPUTE_DEDUP_WINDOW, \
+    COMPUTE_SUBMIT_WORKERS, COMPUTE_SLIDERS, COMPUTE_BATCH_MAX
+from src.utils.utils_database import compute_db
+from src.utils.utils_jobs import job_pool, parameters_hash
+
+COMPUTE_PARAMETERS = ('radius', 'count', 'span')
+
+
+def parameters_key(slider_values: dict) -> Tuple:
+    """
+    Returns the parameters of a submission that define the baked geometry.
+    """
+    return tuple(slider_values.get(name) for name in COMPUTE_PARAMETERS)
+
+
+class SubmissionCoalescer:
+    """
+    Coalesces the slider submissions of each client before they reach the database and
+    Rhino.compute. A submission waits `settle` seconds and is dropped if the same client sends
+    a newer one meanwhile, and a parameter set the client already had accepted in the last
+    `window` seconds is dropped as a duplicate. The submissions of other clients never drop it.
+
+    Args:
+        settle (float, optional): Seconds a submission waits for a newer one.
+        window (float, optional): Seconds an accepted parameter set is not accepted again.
+    """
+
+    def __init__(self, settle: float = COMPUTE_SETTLE_SECONDS,
+                 window: float = COMPUTE_DEDUP_WINDOW) -> None:
+        self.settle = settle
+        self.window = window
+        self._sequence = 0
+        self._latest: Dict[Optional[str], int] = {}  # Latest submission settling per client
+        self._accepted: Dict[Tuple, float] = {}  # Accepted (client, parameters) and their time
+        self._lock = threading.Lock()
+
+    def register(self, client: Optional[str] = None) -> int:
+        """
+        Registers a new submission of a client and returns its sequence, newer submissions of
+        the same client supersede it.
+        """
+        with self._lock:
+            self._sequence += 1
+            self._latest[client] = self._sequence
+            return self._sequence
+
+    def accept(self, slider_values: dict, sequence: Optional[int] = None,
+               client: Optional[str] = None) -> bool:
+        """
+        Waits for the submission to settle and returns if it has to be sent.
+
+        Args:
+            slider_values (dict): The submitted slider values.
+            sequence (int, optional): The sequence of the submission if it was registered when
+                it arrived, it is registered now by default.
+            client (str, optional): The client (e.g. the Dash session) of the submission.
+
+        Returns:
+            bool: False if the values were superseded or are a duplicate.
+        """
+        if sequence is None:
+            sequence = self.register(client)
+
+        if self.settle > 0:
+            time.sleep(self.settle)
+
+        with self._lock:
+            if self._latest.get(client) != sequence:
+                logging.info(f'Superseded slider values of {client} dropped: {slider_values}')
+                return False
+            del self._latest[client]  # Settled, a later submission starts a new one
+
+            now = time.monotonic()
+            self._accepted = {key: accepted_at for key, accepted_at in self._accepted.items()
+                              if now - accepted_at < self.window}
+            key = (client, parameters_key(slider_values))
+            if key in self._accepted:
+                logging.info(f'Duplicated slider values of {client} dropped: {slider_values}')
+                return False
+            self._accepted[key] = now
+            return True
+
+    def forget(self, slider_values: dict, client: Optional[str] = None) -> None:
+        """
+        Allows a parameter set of a client to be accepted again (e.g. its submission failed).
+        """
+        with self._lock:
+            self._accepted.pop((client, parameters_key(slider_values)), None)
+
+
+submission_coalescer = SubmissionCoalescer()
+submit_executor = ThreadPoolExecutor(max_workers=COMPUTE_SUBMIT_WORKERS,
+                                     thread_name_prefix='compute-submit')
+
+
+def validate_slider_values(slider_values: Optional[dict]) -> dict:
+    """
+    Checks that a submission has every compute parameter inside the range of its slider.
+
+    Raises:
+        ValueError: If the values are missing, incomplete or out of range.
+    """
+    if not isinstance(slider_values, dict):
+        raise ValueError('No slider values provided')
+    missing = [name for name in COMPUTE_PARAMETERS if slider_values.get(name) is None]
+    if missing:
+        raise ValueError(f'Missing slider values: {", ".join(missing)}')
+    for name in COMPUTE_PARAMETERS:
+        value, slider = slider_values[name], COMPUTE_SLIDERS[name]
+        if isinstance(value, bool) or not isinstance(value, numbers.Number) or \
+                not slider['min'] <= value <= slider['max']:
+            raise ValueError(f'Invalid {name}: {value!r}, expected a number between '
+                             f'{slider["min"]} and {slider["max"]}')
+    return slider_values
+
+
+def validate_batch(slider_values_list: list) -> List[dict]:
+    """
+    Checks every set of slider values of a batch and reports all the invalid ones at once.
+
+    Raises:
+        ValueError: If the batch is empty, too large or has invalid values.
+    """
+    if not isinstance(slider_values_list, list) or not slider_values_list:
+        raise ValueError('No slider values provided')
+    if len(slider_values_list) > COMPUTE_BATCH_MAX:
+        raise ValueError(f'Too many slider values: {len(slider_values_list)}, '
+                         f'the limit is {COMPUTE_BATCH_MAX}')
+    errors = []
+    for i, slider_values in enumerate(slider_values_list):
+        try:
+            validate_slider_values(slider_values)
+        except ValueError as e:
+            errors.append(f'{i}: {e}')
+    if errors:
+        raise ValueError('; '.join(errors[:20]) + ('; ...' if len(errors) > 20 else ''))
+    return slider_values_list
+
+
+def _submit(slider_values: dict, sequence: int, client: Optional[str]) -> Optional[int]:
+    if not submission_coalescer.accept(slider_values, sequence, client):
+        return None
+    try:
+        job_id, created = job_pool.enqueue(slider_values)
+    except Exception:
+        submission_coalescer.forget(slider_values, client)
+        raise
+    logging.info(f'Slider values queued in the compute job {job_id}' if created else
+                 f'Slider values already queued in the compute job {job_id}')
+    return job_id
+
+
+def _log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logging.error(f'Error submitting the slider values: {future.exception()}')
+
+
+def submit_parameters(slider_values: dict, wait: bool = True,
+                      client: Optional[str] = None) -> Union[Optional[int], Future]:
+    """
+    Submits the compute parameters of a bake, shared by the Dash callbacks and the API. The
+    submission is coalesced with the ones of the same client around it before it is queued as
+    a compute job.
+
+    Args:
+        slider_values (dict): The radius, count, span and commit message of the bake.
+        wait (bool, optional): Wait for the submission to be queued, otherwise it is queued in
+            the background and the future of its result is returned.
+        client (str, optional): The client of the submission, e.g. the Dash session or the
+            address of an API caller. The submissions without client are coalesced together.
+
+    Returns:
+        Union[Optional[int], Future]: The id of the compute job (None if the values were
+            superseded or duplicated), or the future of it.
+
+    Raises:
+        ValueError: If the values are incomplete.
+    """
+    validate_slider_values(slider_values)
+    # The order of the submissions is the order they arrive, not the order they are processed
+    sequence = submission_coalescer.register(client)
+    if wait:
+        return _submit(slider_values, sequence, client)
+    future = submit_executor.submit(_submit, slider_values, sequence, client)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def submit_batch(slider_values_list: list) -> List[dict]:
+    """
+    Queues a batch of parameter sets (e.g. a design space exploration) as compute jobs in one
+    transaction. The batch is not coalesced, but the sets already computed return their commit
+    and the ones already queued share their job.
+
+    Args:
+        slider_values_list (list): The slider values of each set.
+
+    Returns:
+        List[dict]: For each set, its `job_id` and if the job is `created`, or the `commit_id`
+            and `model_name` of the sets already computed (with the 'cached' status).
+
+    Raises:
+        ValueError: If any set is invalid, nothing is queued then.
+    """
+    validate_batch(slider_values_list)
+    hashes = [parameters_hash(slider_values) for slider_values in slider_values_list]
+    results = compute_db.get_results(hashes)
+    pending = [slider_values for slider_values, params_hash in zip(slider_values_list, hashes)
+               if params_hash not in results]
+    jobs = iter(job_pool.enqueue_many(pending))
+
+    submitted = []
+    for params_hash in hashes:
+        if params_hash in results:
+            submitted.append({'status': 'cached', 'commit_id': results[params_hash]['commit_id'],
+                              'model_name': results[params_hash]['model_name']})
+        else:
+            job_id, created = next(jobs)
+            submitted.append({'status': 'queued', 'job_id': job_id, 'created': created})
+    logging.info(f'{len(pending)} slider values queued, {len(hashes) - len(pending)} already '
+                 f'computed')
+    return submitted
+
+
+def _slider_steps(name: str) -> np.ndarray:
+    slider = COMPUTE_SLIDERS[name]
+    steps = np.arange(slider['min'], slider['max'] + slider['step'], slider['step'])
+    return steps[steps <= slider['max']]
+
+
+def grid_parameters(commit_message: Optional[str] = None) -> List[dict]:
+    """
+    Returns every combination of the steps of the compute sliders.
+    """
+    steps = [_slider_steps(name).tolist() for name in COMPUTE_PARAMETERS]
+    return [dict(zip(COMPUTE_PARAMETERS, values), commit_message=commit_message)
+            for values in itertools.product(*steps)]
+
+
+def latin_hypercube_parameters(samples: int, seed: Optional[int] = None,
+                               commit_message: Optional[str] = None) -> List[dict]:
+    """
+    Returns a Latin hypercube sample of the compute sliders: the range of each parameter is
+    split in `samples` intervals and each interval is used once, snapped to the slider steps.
+
+    Args:
+        samples (int): Number of parameter sets.
+        seed (int, optional): Seed of the sample.
+        commit_message (str, optional): The commit message of every set.
+
+    Returns:
+        List[dict]: The parameter sets.
+    """
+    rng = np.random.default_rng(seed)
+    columns = []
+    for name in COMPUTE_PARAMETERS:
+        steps = _slider_steps(name)
+        # A random point of each interval, the intervals shuffled per parameter
+        points = (rng.permutation(samples) + rng.random(samples)) / samples
+        columns.append(steps[np.minimum((points * len(steps)).astype(int), len(steps) - 1)])
+    return [dict(zip(COMPUTE_PARAMETERS, values), commit_message=commit_message)
+            for values in np.column_stack(columns).tolist()]
@@ -0,0 +1,543 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from config.settings import COMPUTE_DB_PATH, COMPUTE_DB_POOL_SIZE
+
+# Schema migrations, applied once and in order. The version of a database is its
+# `PRAGMA user_version`, the number of migrations already applied to it
+MIGRATIONS = [
+    # 1: Slider values read by Rhino.compute
+    ["""
+        CREATE TABLE IF NOT EXISTS slider_values (
+            id SERIAL PRIMARY KEY,
+            radius INTEGER,
+            counte INTEGER,
+            span INTEGER,
+            commit_message TEXT
+        )
+    """],
+    # 2: `id SERIAL` isn't a rowid alias in SQLite and was always NULL, the rows are copied
+    # with their rowid as an autoincrement id
+    ["""
+        CREATE TABLE slider_values_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            radius INTEGER,
+            counte INTEGER,
+            span INTEGER,
+            commit_message TEXT
+        )
+    """, """
+        INSERT INTO slider_values_new (id, radius, counte, span, commit_message)
+        SELECT rowid, radius, counte, span, commit_message
+        FROM slider_values
+        ORDER BY rowid
+    """,
+     "DROP TABLE slider_values",
+     "ALTER TABLE slider_values_new RENAME TO slider_values"],
+    # 3: Queue of the compute jobs, a parameter set is queued or running once at most
+    ["""
+        CREATE TABLE compute_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            params_hash TEXT NOT NULL,
+            radius INTEGER,
+            count INTEGER,
+            span INTEGER,
+            commit_message TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    """,
+     "CREATE INDEX compute_jobs_status ON compute_jobs (status, id)",
+     """
+        CREATE UNIQUE INDEX compute_jobs_pending ON compute_jobs (params_hash)
+        WHERE status IN ('queued', 'running')
+    """],
+    # 4: Commits of the parameter sets already computed, filled with the jobs already done
+    ["""
+        CREATE TABLE compute_results (
+            params_hash TEXT PRIMARY KEY,
+            commit_id TEXT NOT NULL,
+            model_name TEXT,
+            created_at REAL NOT NULL
+        )
+    """, """
+        INSERT OR REPLACE INTO compute_results (params_hash, commit_id, model_name, created_at)
+        SELECT params_hash, json_extract(result, '$.commit_id'),
+               json_extract(result, '$.model_name'), finished_at
+        FROM compute_jobs
+        WHERE status = 'done' AND json_extract(result, '$.commit_id') IS NOT NULL
+        ORDER BY id
+    """],
+    # 5: Commit baked from each set of slider values, reported by the appserver
+    ["ALTER TABLE slider_values ADD COLUMN commit_id TEXT",
+     "ALTER TABLE slider_values ADD COLUMN model_name TEXT"],
+]
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = 'queued', 'running', 'done', 'failed'
+JOB_COLUMNS = ('id', 'params_hash', 'radius', 'count', 'span', 'commit_message', 'status',
+               'attempts', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+
+# Constant statements, sqlite3 keeps them prepared in the statement cache of each connection
+INSERT_SLIDER_VALUES = """
+    INSERT INTO slider_values (radius, counte, span, commit_message)
+    VALUES (?, ?, ?, ?)
+"""
+SELECT_JOBS_SEQUENCE = "SELECT seq FROM sqlite_sequence WHERE name = 'compute_jobs'"
+SELECT_PENDING_JOB = f"""
+    SELECT id FROM compute_jobs
+    WHERE params_hash = ? AND status IN ('{JOB_QUEUED}', '{JOB_RUNNING}')
+"""
+INSERT_JOB = """
+    INSERT INTO compute_jobs (params_hash, radius, count, span, commit_message, status,
+                              created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_NEXT_JOB = f"""
+    SELECT {', '.join(JOB_COLUMNS)} FROM compute_jobs
+    WHERE status = '{JOB_QUEUED}'
+    ORDER BY id
+    LIMIT 1
+"""
+UPDATE_JOB_RUNNING = f"""
+    UPDATE compute_jobs SET status = '{JOB_RUNNING}', attempts = attempts + 1, started_at = ?
+    WHERE id = ?
+"""
+UPDATE_JOB_FINISHED = """
+    UPDATE compute_jobs SET status = ?, result = ?, error = ?, finished_at = ?
+    WHERE id = ?
+"""
+UPDATE_RUNNING_JOBS_QUEUED = f"""
+    UPDATE compute_jobs SET status = '{JOB_QUEUED}', started_at = NULL
+    WHERE status = '{JOB_RUNNING}'
+"""
+SELECT_JOB = f"SELECT {', '.join(JOB_COLUMNS)} FROM compute_jobs WHERE id = ?"
+SELECT_JOBS = f"SELECT {', '.join(JOB_COLUMNS)} FROM compute_jobs ORDER BY id DESC LIMIT ?"
+SELECT_JOBS_BY_STATUS = f"""
+    SELECT {', '.join(JOB_COLUMNS)} FROM compute_jobs
+    WHERE status = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+SELECT_RESULT = """
+    SELECT params_hash, commit_id, model_name, created_at FROM compute_results
+    WHERE params_hash = ?
+"""
+INSERT_RESULT = """
+    INSERT OR REPLACE INTO compute_results (params_hash, commit_id, model_name, created_at)
+    VALUES (?, ?, ?, ?)
+"""
+UPDATE_SLIDER_VALUES_COMMIT = "UPDATE slider_values SET commit_id = ?, model_name = ? WHERE id = ?"
+SELECT_SLIDER_VALUES_PARAMETERS = "SELECT radius, counte, span FROM slider_values WHERE id = ?"
+SELECT_SLIDER_VALUES_COMMIT = "SELECT commit_id, model_name FROM slider_values WHERE id = ?"
+SELECT_SLIDER_VALUES_SINCE = """
+    SELECT id, radius, counte, span, commit_message
+    FROM slider_values
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+SELECT_LATEST_SLIDER_VALUES = """
+    SELECT id, radius, counte, span, commit_message
+    FROM slider_values
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+
+class ComputeDatabase:
+    """
+    SQLite storage of the compute parameters shared by the dashboard and the Rhino.compute
+    appserver. The connections are opened once and kept in a bounded pool, each call checks
+    one out and returns it (Flask serves every request in a new thread), and the database runs
+    in WAL mode so the polling reads of the appserver don't wait for the writes of the
+    dashboard. The schema is migrated once when the database is opened, and the latest slider
+    values (polled by the appserver) are kept in memory until the next write.
+
+    Args:
+        path (str, optional): The path of the database file.
+        pool_size (int, optional): Maximum number of open connections, a call waits for a free
+            one past it.
+    """
+
+    def __init__(self, path: str = COMPUTE_DB_PATH,
+                 pool_size: int = COMPUTE_DB_POOL_SIZE) -> None:
+        self.path = os.path.abspath(path)  # The same file for every thread
+        self.pool_size = max(1, pool_size)
+        self._pool: queue.LifoQueue = queue.LifoQueue()  # Idle connections
+        self._opened = 0
+        self._closed = False
+        self._pool_lock = threading.Lock()
+        self._latest_lock = threading.Condition()  # Also notifies the writes to the streams
+        self._latest: Optional[dict] = None
+        self._latest_loaded = False
+        self._writes = 0  # Counter of the writes, a read older than a write isn't cached
+        self.migrate()
+
+    def __repr__(self) -> str:
+        return f"ComputeDatabase(path: {self.path})"
+
+    def _open(self) -> sqlite3.Connection:
+        # Used by one thread at a time, but not always the thread that opened it
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Checks out a connection of the pool for the duration of the block, a new one is opened
+        while the pool has less than `pool_size`.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('The compute database is closed')
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = self._open()
+                except BaseException:
+                    with self._pool_lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._pool.get(timeout=30)
+                except queue.Empty:
+                    raise sqlite3.OperationalError('No free connection to the compute database')
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._pool_lock:
+                closed = self._closed
+                if closed:
+                    self._opened -= 1
+            if closed:
+                conn.close()
+            else:
+                self._pool.put(conn)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections, the ones checked out are closed when they are returned.
+        """
+        with self._pool_lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            with self._pool_lock:
+                self._opened -= 1
+            conn.close()
+
+    def version(self) -> int:
+        with self.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> None:
+        """
+        Applies the migrations missing in the database, each one in its own transaction.
+        """
+        with self.connection() as conn:
+            self._migrate(conn)
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        while True:
+            # The write lock is taken before reading the version, so concurrent processes
+            # don't apply the same migration twice
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.rollback()
+                    return
+                for statement in MIGRATIONS[version]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+                logging.info(f'Compute database migrated to version {version + 1}')
+            except Exception:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def immediate(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transaction that takes the write lock from the start, so what it reads can't change
+        before it writes.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def invalidate_latest(self) -> None:
+        with self._latest_lock:
+            self._writes += 1
+            self._latest, self._latest_loaded = None, False
+            self._latest_lock.notify_all()
+
+    def write_count(self) -> int:
+        with self._latest_lock:
+            return self._writes
+
+    def wait_for_write(self, write_count: int, timeout: float) -> bool:
+        """
+        Waits until there is a write after `write_count` (see `write_count()`).
+
+        Returns:
+            bool: False if the timeout expired without writes.
+        """
+        with self._latest_lock:
+            return self._latest_lock.wait_for(lambda: self._writes != write_count, timeout)
+
+    def insert_slider_values(self, slider_values: dict) -> int:
+        """
+        Stores a set of slider values.
+
+        Args:
+            slider_values (dict): The radius, count, span and commit message.
+
+        Returns:
+            int: The id of the stored values.
+        """
+        try:
+            with self.connection() as conn, conn:
+                cur = conn.execute(INSERT_SLIDER_VALUES, (
+                    slider_values['radius'], slider_values['count'], slider_values['span'],
+                    slider_values.get('commit_message')))
+                return cur.lastrowid
+        finally:
+            self.invalidate_latest()
+
+    def latest_slider_values(self) -> Optional[dict]:
+        """
+        Returns the latest slider values with their id, or None if there aren't any.
+        """
+        with self._latest_lock:
+            if self._latest_loaded:
+                return self._latest
+            writes = self._writes
+
+        with self.connection() as conn:
+            row = conn.execute(SELECT_LATEST_SLIDER_VALUES).fetchone()
+        latest = _slider_values(row) if row is not None else None
+
+        with self._latest_lock:
+            if writes == self._writes:
+                self._latest, self._latest_loaded = latest, True
+        return latest
+
+    def slider_values_since(self, since_id: int, limit: int = 100) -> List[dict]:
+        """
+        Returns the slider values stored after the id `since_id`, oldest first.
+        """
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_SLIDER_VALUES_SINCE, (since_id, limit)).fetchall()
+        return [_slider_values(row) for row in rows]
+
+    def report_commit(self, slider_values_id: int, commit_id: str,
+                      model_name: Optional[str] = None) -> Optional[dict]:
+        """
+        Records the commit baked from a set of slider values.
+
+        Returns:
+            Optional[dict]: The radius, count and span of the set, or None if it doesn't exist.
+        """
+        with self.connection() as conn, conn:
+            conn.execute(UPDATE_SLIDER_VALUES_COMMIT, (commit_id, model_name, slider_values_id))
+            row = conn.execute(SELECT_SLIDER_VALUES_PARAMETERS, (slider_values_id,)).fetchone()
+        return dict(zip(('radius', 'count', 'span'), row)) if row is not None else None
+
+    def slider_values_commit(self, slider_values_id: int) -> Optional[dict]:
+        """
+        Returns the commit reported for a set of slider values, or None if there isn't any yet.
+        """
+        with self.connection() as conn:
+            row = conn.execute(SELECT_SLIDER_VALUES_COMMIT, (slider_values_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return {'commit_id': row[0], 'model_name': row[1]}
+
+    # Compute jobs
+    def enqueue_job(self, params_hash: str, slider_values: dict) -> Tuple[int, bool]:
+        """
+        Queues a compute job, unless a job of the same parameters is already queued or running.
+
+        Args:
+            params_hash (str): The hash of the parameters of the job.
+            slider_values (dict): The radius, count, span and commit message.
+
+        Returns:
+            Tuple[int, bool]: The id of the job and if it is a new job.
+        """
+        with self.immediate() as conn:
+            row = conn.execute(SELECT_PENDING_JOB, (params_hash,)).fetchone()
+            if row is not None:
+                return row[0], False
+            cur = conn.execute(INSERT_JOB, (
+                params_hash, slider_values['radius'], slider_values['count'],
+                slider_values['span'], slider_values.get('commit_message'), JOB_QUEUED,
+                time.time()))
+            return cur.lastrowid, True
+
+    def enqueue_jobs(self, jobs: List[Tuple[str, dict]]) -> List[Tuple[int, bool]]:
+        """
+        Queues several compute jobs in one transaction, the parameters already queued or
+        running (or repeated in the batch) share their job.
+
+        Args:
+            jobs (List[Tuple[str, dict]]): The hash of the parameters and the slider values of
+                each job.
+
+        Returns:
+            List[Tuple[int, bool]]: The id of each job and if it is a new job, in the same order.
+        """
+        if not jobs:
+            return []
+        with self.immediate() as conn:
+            job_ids = {}
+            for params_hash, _ in jobs:
+                if params_hash not in job_ids:
+                    row = conn.execute(SELECT_PENDING_JOB, (params_hash,)).fetchone()
+                    job_ids[params_hash] = row[0] if row is not None else None
+
+            new_jobs = {params_hash: slider_values for params_hash, slider_values in jobs
+                        if job_ids[params_hash] is None}
+            now = time.time()
+            conn.executemany(INSERT_JOB, [
+                (params_hash, slider_values['radius'], slider_values['count'],
+                 slider_values['span'], slider_values.get('commit_message'), JOB_QUEUED, now)
+                for params_hash, slider_values in new_jobs.items()])
+            if new_jobs:
+                # The write lock is held, the ids are consecutive and end at the sequence
+                last_id = conn.execute(SELECT_JOBS_SEQUENCE).fetchone()[0]
+                job_ids.update(zip(new_jobs, range(last_id - len(new_jobs) + 1, last_id + 1)))
+
+        created = set()
+        results = []
+        for params_hash, _ in jobs:
+            results.append((job_ids[params_hash],
+                            params_hash in new_jobs and params_hash not in created))
+            created.add(params_hash)
+        return results
+
+    def claim_job(self) -> Optional[dict]:
+        """
+        Marks the oldest queued job as running and returns it, or None if the queue is empty.
+        """
+        with self.immediate() as conn:
+            row = conn.execute(SELECT_NEXT_JOB).fetchone()
+            if row is None:
+                return None
+            job = _job(row)
+            conn.execute(UPDATE_JOB_RUNNING, (time.time(), job['id']))
+        job.update(status=JOB_RUNNING, attempts=job['attempts'] + 1)
+        return job
+
+    def finish_job(self, job_id: int, status: str, result: Optional[dict] = None,
+                   error: Optional[str] = None) -> None:
+        with self.connection() as conn, conn:
+            conn.execute(UPDATE_JOB_FINISHED, (
+                status, json.dumps(result) if result is not None else None, error, time.time(),
+                job_id))
+
+    def requeue_running_jobs(self) -> int:
+        """
+        Queues again the jobs left running (e.g. by a crash), returns how many there were.
+        """
+        with self.connection() as conn, conn:
+            return conn.execute(UPDATE_RUNNING_JOBS_QUEUED).rowcount
+
+    def get_job(self, job_id: int) -> Optional[dict]:
+        with self.connection() as conn:
+            row = conn.execute(SELECT_JOB, (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """
+        Returns the latest jobs, newest first, optionally only the ones in a status.
+        """
+        with self.connection() as conn:
+            if status is None:
+                rows = conn.execute(SELECT_JOBS, (limit,)).fetchall()
+            else:
+                rows = conn.execute(SELECT_JOBS_BY_STATUS, (status, limit)).fetchall()
+        return [_job(row) for row in rows]
+
+    # Compute results
+    def get_result(self, params_hash: str) -> Optional[dict]:
+        """
+        Returns the commit computed for a parameter set, or None if it was never computed.
+        """
+        with self.connection() as conn:
+            row = conn.execute(SELECT_RESULT, (params_hash,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('params_hash', 'commit_id', 'model_name', 'created_at'), row))
+
+    def get_results(self, params_hashes: List[str]) -> dict:
+        """
+        Returns the commits computed for several parameter sets, by hash. The sets never
+        computed are not in the result.
+        """
+        results = {}
+        with self.connection() as conn:
+            for params_hash in set(params_hashes):
+                row = conn.execute(SELECT_RESULT, (params_hash,)).fetchone()
+                if row is not None:
+                    results[params_hash] = dict(zip(
+                        ('params_hash', 'commit_id', 'model_name', 'created_at'), row))
+        return results
+
+    def save_result(self, params_hash: str, commit_id: str,
+                    model_name: Optional[str] = None) -> None:
+        """
+        Records the commit computed for a parameter set, replacing the previous one.
+        """
+        with self.connection() as conn, conn:
+            conn.execute(INSERT_RESULT, (params_hash, commit_id, model_name, time.time()))
+
+
+def _job(row: tuple) -> dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    if job['result'] is not None:
+        job['result'] = json.loads(job['result'])
+    return job
+
+
+def _slider_values(row: tuple) -> dict:
+    id_value, radius_value, counte_value, span_value, commit_message = row
+    return {'id': id_value, 'radius': radius_value, 'counte': counte_value, 'span': span_value,
+            'commit_message': commit_message}
+
+
+compute_db = ComputeDatabase()
+atexit.register(compute_db.close)
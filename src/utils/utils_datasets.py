@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from config.settings import DATASETS_MAX_ENTRIES
+
+
+class DatasetRegistry:
+    """
+    Server-side registry of the DataFrames shown by the dashboard. The `dcc.Store` components
+    only hold the key of a dataset (its name and version) and the callbacks resolve the key to
+    the DataFrame kept in memory, so the data never travels to the browser and back. The least
+    recently used datasets are dropped past `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = DATASETS_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._datasets: OrderedDict = OrderedDict()
+        self._derived: dict = {}  # Objects computed from each dataset (e.g. filter indexes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, version: int) -> str:
+        return f'{name}@{version}'
+
+    def put(self, name: str, version: int, df: pd.DataFrame) -> str:
+        """
+        Registers a version of a dataset.
+
+        Args:
+            name (str): The name of the dataset.
+            version (int): The version of the dataset.
+            df (pd.DataFrame): The data, it must not be modified once registered.
+
+        Returns:
+            str: The key of the dataset.
+        """
+        key = self.key(name, version)
+        with self._lock:
+            if self._datasets.get(key) is not df:
+                self._derived.pop(key, None)
+            self._datasets[key] = df
+            self._datasets.move_to_end(key)
+            while len(self._datasets) > self.max_entries:
+                evicted_key, _ = self._datasets.popitem(last=False)
+                self._derived.pop(evicted_key, None)
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[pd.DataFrame]:
+        """
+        Returns the dataset of a key, or None if it is unknown or was evicted.
+        """
+        with self._lock:
+            df = self._datasets.get(key)
+            if df is not None:
+                self._datasets.move_to_end(key)
+            return df
+
+    def derived(self, key: Optional[str], name: str,
+                factory: Callable[[pd.DataFrame], Any]) -> Optional[Any]:
+        """
+        Returns an object computed from a dataset with `factory`, computed only once per
+        dataset version and dropped with the dataset.
+
+        Args:
+            key (str): The key of the dataset.
+            name (str): The name of the derived object.
+            factory (Callable): Builds the object from the DataFrame.
+
+        Returns:
+            Any: The derived object, or None if the dataset is unknown.
+        """
+        df = self.get(key)
+        if df is None:
+            return None
+        with self._lock:
+            value = self._derived.get(key, {}).get(name)
+        if value is None:
+            value = factory(df)
+            with self._lock:
+                if key in self._datasets:
+                    self._derived.setdefault(key, {})[name] = value
+        return value
+
+
+datasets = DatasetRegistry()
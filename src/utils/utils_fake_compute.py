@@ -0,0 +1,42 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+FAKE_COMPUTE_MODEL = 'compute/fake'
+
+
+class FakeComputeBackend:
+    """
+    Local stand-in of Rhino.compute for the job queue: a job takes `duration` seconds and
+    returns a commit id derived from its parameters. It is used to run the queue without the
+    appserver.
+
+    Args:
+        duration (float, optional): Seconds each job takes.
+        fail_radius (int, optional): Jobs with this radius fail, to test the failures.
+    """
+
+    def __init__(self, duration: float = 0.1, fail_radius: Optional[int] = None) -> None:
+        self.duration = duration
+        self.fail_radius = fail_radius
+        self.runs = 0
+        self.running = 0
+        self.max_running = 0  # Highest number of jobs run at the same time
+        self._lock = threading.Lock()
+
+    def run(self, job: dict) -> dict:
+        with self._lock:
+            self.runs += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.duration)
+            if self.fail_radius is not None and job['radius'] == self.fail_radius:
+                raise RuntimeError(f'Fake compute failed with radius {job["radius"]}')
+            commit_id = hashlib.md5(job['params_hash'].encode()).hexdigest()[:10]
+            return {'slider_values_id': None, 'model_name': FAKE_COMPUTE_MODEL,
+                    'commit_id': commit_id}
+        finally:
+            with self._lock:
+                self.running -= 1
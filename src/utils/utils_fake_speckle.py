@@ -0,0 +1,260 @@
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from specklepy.core.api.models import Branch, Commit, Commits
+from specklepy.transports.abstract_transport import AbstractTransport
+
+from utils.utils_cache import ObjectCacheTransport
+
+FAKE_HOST = 'http://fake.speckle'
+FAKE_PROJECT = 'fakeproject'
+
+
+class FakeSpeckleServer:
+    """
+    In-process stand-in of a Speckle server: the serialized objects of a project and the
+    commits of its models. It is used to run the ingestion pipeline without network.
+
+    Args:
+        latency (float, optional): Seconds added to every request, to simulate round trips.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.objects: Dict[str, str] = {}
+        self.models: Dict[str, List[Commit]] = {}  # Newest commit first
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def wait(self) -> None:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_object(self, obj: dict) -> str:
+        """
+        Serializes an object and stores it under the hash of its content.
+        """
+        obj_string = json.dumps(obj, separators=(',', ':'))
+        obj_id = hashlib.md5(obj_string.encode()).hexdigest()
+        obj['id'] = obj_id
+        self.objects[obj_id] = json.dumps(obj, separators=(',', ':'))
+        return obj_id
+
+    def add_commit(self, model_name: str, object_id: str, message: str = '',
+                   created_at: Optional[datetime] = None) -> Commit:
+        commits = self.models.setdefault(model_name, [])
+        commit = Commit(id=hashlib.md5(f'{model_name}{len(commits)}'.encode()).hexdigest()[:10],
+                        message=message, authorName='fake', authorId='fake',
+                        branchName=model_name, referencedObject=object_id,
+                        sourceApplication='python',
+                        createdAt=created_at or datetime.now(timezone.utc))
+        commits.insert(0, commit)
+        return commit
+
+
+def reference(object_id: str) -> dict:
+    return {'referencedId': object_id, 'speckle_type': 'reference'}
+
+
+def generate_project(n_commits: int, n_elements: int, model_name: str = 'compute/facade',
+                     n_vertices: int = 300, seed: int = 0,
+                     server: Optional[FakeSpeckleServer] = None) -> FakeSpeckleServer:
+    """
+    Fills a fake server with synthetic baked variants: each commit references a collection with
+    a `Data` object whose `@Elements` list holds `n_elements` pieces, every piece with its
+    `metadata` and a detached mesh in `@displayValue`.
+
+    Args:
+        n_commits (int): Number of commits of the model.
+        n_elements (int): Number of pieces per commit.
+        model_name (str, optional): The name of the model.
+        n_vertices (int, optional): Number of vertices of each mesh (the geometry payload).
+        seed (int, optional): Seed of the random values.
+        server (FakeSpeckleServer, optional): The server to fill, a new one by default.
+
+    Returns:
+        FakeSpeckleServer: The server with the generated project.
+    """
+    server = server or FakeSpeckleServer()
+    rnd = random.Random(seed)
+    # New commits follow the existing ones so that the cursors of an extended server stay valid
+    created = [commits[0].createdAt for commits in server.models.values() if commits]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    if created:
+        start = max(created) + timedelta(minutes=1)
+
+    for i in range(n_commits):
+        radius, count, span = rnd.randint(0, 20), rnd.randint(0, 20), rnd.randint(0, 20)
+        element_ids = []
+        closure = {}
+        for j in range(n_elements):
+            mesh_id = server.add_object({
+                'speckle_type': 'Objects.Geometry.Mesh', 'totalChildrenCount': 0,
+                'applicationId': None, 'units': 'm',
+                'vertices': [round(rnd.random(), 4) for _ in range(n_vertices)]})
+            metadata = {'speckle_type': 'Base', 'totalChildrenCount': 0, 'applicationId': None,
+                        'units': None, 'radius': radius, 'count': count, 'span': span,
+                        'width': round(rnd.uniform(0.5, 3), 3),
+                        'height': round(rnd.uniform(0.5, 4), 3),
+                        'material': rnd.choice(['glass', 'ceramic', 'steel'])}
+            metadata['id'] = hashlib.md5(json.dumps(metadata).encode()).hexdigest()
+            element_ids.append(server.add_object({
+                'speckle_type': 'Base', 'totalChildrenCount': 1, 'applicationId': None,
+                'units': None, 'metadata': metadata,
+                '@displayValue': [reference(mesh_id)],
+                '__closure': {mesh_id: 1}}))
+            closure.update({mesh_id: 3, element_ids[-1]: 2})
+
+        data_id = server.add_object({
+            'speckle_type': 'Base', 'totalChildrenCount': 2 * n_elements,
+            'applicationId': None, 'units': None,
+            '@Elements': [reference(element_id) for element_id in element_ids],
+            '__closure': {k: v - 1 for k, v in closure.items()}})
+        closure[data_id] = 1
+        root_id = server.add_object({
+            'speckle_type': 'Base', 'totalChildrenCount': len(closure), 'applicationId': None,
+            'units': None, 'Data': reference(data_id), '__closure': closure})
+        server.add_commit(model_name, root_id, message=f'radius {radius} count {count}',
+                          created_at=start + timedelta(minutes=i))
+
+    return server
+
+
+class FakeBranchResource:
+    """
+    Stubs of `client.branch.list` and of the paginated commits query.
+    """
+
+    def __init__(self, server: FakeSpeckleServer) -> None:
+        self.server = server
+
+    def list(self, stream_id: str, branches_limit: int = 10, commits_limit: int = 10):
+        self.server.wait()
+        return [Branch(id=hashlib.md5(name.encode()).hexdigest()[:10], name=name,
+                       commits=Commits(totalCount=len(commits), items=commits[:commits_limit]))
+                for name, commits in list(self.server.models.items())[:branches_limit]]
+
+    def make_request(self, query, params: Optional[dict] = None, return_type=None, schema=None,
+                     parse_response: bool = True):
+        self.server.wait()
+        commits = self.server.models.get(params['name'], [])
+        if params.get('cursor'):
+            cursor = datetime.fromisoformat(params['cursor'])
+            commits = [commit for commit in commits if commit.createdAt < cursor]
+        items = commits[:params['limit']]
+        return Commits(totalCount=len(self.server.models.get(params['name'], [])),
+                       cursor=items[-1].createdAt if items else None, items=items)
+
+
+class FakeClient:
+    """
+    Stand-in of `SpeckleClient` with the resources used by `utils_speckle`.
+    """
+
+    def __init__(self, server: FakeSpeckleServer) -> None:
+        self.url = FAKE_HOST
+        self.branch = FakeBranchResource(server)
+
+
+class FakeResponse:
+    def __init__(self, lines: List[str]) -> None:
+        self.lines = lines
+        self.encoding = 'utf-8'
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_lines(self, decode_unicode: bool = False):
+        return iter(self.lines)
+
+
+class FakeSession:
+    """
+    Stand-in of the requests session of `ServerTransport`, only `/api/getobjects` is served.
+    """
+
+    def __init__(self, server: FakeSpeckleServer) -> None:
+        self.server = server
+
+    def post(self, url: str, data: dict, stream: bool = False) -> FakeResponse:
+        self.server.wait()
+        lines = [f"{object_id}\t{self.server.objects[object_id]}"
+                 for object_id in json.loads(data['objects'])
+                 if object_id in self.server.objects]
+        self.server.bytes_sent += sum(len(line) for line in lines)
+        return FakeResponse(lines)
+
+
+class FakeServerTransport(AbstractTransport):
+    """
+    Stand-in of `ServerTransport` that serves the objects of a `FakeSpeckleServer`.
+    """
+
+    def __init__(self, server: FakeSpeckleServer, stream_id: str = FAKE_PROJECT) -> None:
+        super().__init__()
+        self.server = server
+        self.url = FAKE_HOST
+        self.stream_id = stream_id
+        self.session = FakeSession(server)
+
+    @property
+    def name(self) -> str:
+        return 'FakeServerTransport'
+
+    def begin_write(self) -> None:
+        pass
+
+    def end_write(self) -> None:
+        pass
+
+    def save_object(self, id: str, serialized_object: str) -> None:
+        self.server.objects[id] = serialized_object
+
+    def save_object_from_transport(self, id: str, source_transport: AbstractTransport) -> None:
+        self.save_object(id, source_transport.get_object(id))
+
+    def get_object(self, id: str) -> Optional[str]:
+        return self.server.objects.get(id)
+
+    def has_objects(self, id_list: List[str]) -> Dict[str, bool]:
+        return {id: id in self.server.objects for id in id_list}
+
+    def copy_object_and_children(self, id: str, target_transport: AbstractTransport) -> str:
+        self.server.wait()
+        root_obj_serialized = self.server.objects[id]
+        children_ids = list(json.loads(root_obj_serialized).get('__closure', {}).keys())
+        children_found_map = target_transport.has_objects(children_ids)
+
+        target_transport.begin_write()
+        for child_id, found in children_found_map.items():
+            if not found:
+                target_transport.save_object(child_id, self.server.objects[child_id])
+                self.server.bytes_sent += len(self.server.objects[child_id])
+        target_transport.save_object(id, root_obj_serialized)
+        target_transport.end_write()
+        self.server.bytes_sent += len(root_obj_serialized)
+
+        return root_obj_serialized
+
+
+def use_fake_backend(server: FakeSpeckleServer, cache: Optional[ObjectCacheTransport] = None,
+                     speckle_module=None) -> None:
+    """
+    Points `utils_speckle` to a fake server.
+
+    Args:
+        server (FakeSpeckleServer): The fake server.
+        cache (ObjectCacheTransport, optional): The local object cache to use.
+        speckle_module (optional): The `utils_speckle` module to patch, by default the one
+            imported by the app (`src.utils.utils_speckle`). Scripts that import it as
+            `utils.utils_speckle` have to pass their module, it is a separate copy.
+    """
+    if speckle_module is None:
+        from src.utils import utils_speckle as speckle_module
+
+    speckle_module.use_backend(FakeClient(server), FakeServerTransport(server), cache)
@@ -0,0 +1,188 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import PARCOORDS_LOD_BINS
+
+
+class RangeFilterIndex:
+    """
+    Sorted index of the numeric columns of a dataset, built once per dataset version. Range
+    constraints over many dimensions are answered with binary searches and one boolean
+    intersection, instead of comparing every row of every column.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+        self.length = len(df)
+        self.columns = {}
+        for column in df.columns:
+            if pd.api.types.is_numeric_dtype(df[column]):
+                values = df[column].to_numpy(dtype=float)
+                order = np.argsort(values, kind='stable')
+                self.columns[column] = (order, values[order])
+
+    def mask(self, constraints: Dict[str, List[list]]) -> np.ndarray:
+        """
+        Returns the boolean mask of the rows inside the ranges of every constrained column
+        (a row matches a column if it is inside any of its ranges). Unknown or non numeric
+        columns are ignored.
+        """
+        mask = np.ones(self.length, dtype=bool)
+        for column, ranges in constraints.items():
+            if column not in self.columns:
+                continue
+            order, sorted_values = self.columns[column]
+            column_mask = np.zeros(self.length, dtype=bool)
+            for low, high in ranges:
+                start = np.searchsorted(sorted_values, low, side='left')
+                end = np.searchsorted(sorted_values, high, side='right')
+                column_mask[order[start:end]] = True
+            mask &= column_mask
+        return mask
+
+    def filter(self, constraints: Dict[str, List[list]]) -> pd.DataFrame:
+        """
+        Returns the rows of the dataset that satisfy the constraints.
+        """
+        if not constraints:
+            return self.df
+        return self.df[self.mask(constraints)]
+
+
+def columnar_data(df_commit_metadata: pd.DataFrame, df_obj_data: pd.DataFrame) -> dict:
+    """
+    Compact columnar copy of a dataset version for the clientside filtering: one list per
+    numeric attribute (aligned with `commitId`) and the rows of the commits table. Missing
+    values are sent as null.
+
+    Args:
+        df_commit_metadata (pd.DataFrame): The metadata of the commits (the table rows).
+        df_obj_data (pd.DataFrame): The attributes of the commits (the parcoords dimensions).
+
+    Returns:
+        dict: The `commitId` list, the `dimensions` lists by label and the `commits` records.
+    """
+    def to_list(series: pd.Series) -> list:
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    dimensions = {column: to_list(df_obj_data[column]) for column in df_obj_data.columns
+                  if column != 'commitId' and pd.api.types.is_numeric_dtype(df_obj_data[column])}
+    return {
+        'commitId': df_obj_data['commitId'].tolist(),
+        'dimensions': dimensions,
+        'commits': df_commit_metadata.astype(object).where(
+            df_commit_metadata.notna(), None).to_dict('records'),
+    }
+
+
+def sample_lines(df: pd.DataFrame, max_lines: int, bins: int = PARCOORDS_LOD_BINS,
+                 seed: int = 0) -> pd.DataFrame:
+    """
+    Stratified sample of the rows of a dataset to cap the lines of a parcoords plot. Every
+    numeric column is split in `bins` quantile bins and each combination of bins is a stratum,
+    the strata keep their share of the rows and the small ones (the extreme variants) keep at
+    least one line as long as `max_lines` allows it.
+
+    Args:
+        df (pd.DataFrame): The dataset.
+        max_lines (int): The maximum number of rows, 0 or less to keep every row.
+        bins (int, optional): Number of quantile bins per numeric column.
+        seed (int, optional): Seed of the sample, fixed so the same version gives the same plot.
+
+    Returns:
+        pd.DataFrame: The sampled rows, in the order of the dataset.
+    """
+    if max_lines <= 0 or len(df) <= max_lines:
+        return df
+
+    numeric = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+    if numeric:
+        # Quantile bin of each value (the missing values get their own bin)
+        ranks = df[numeric].rank(method='first', pct=True).to_numpy()
+        codes = np.minimum(np.nan_to_num(ranks * bins), bins - 1).astype(int)
+        codes[np.isnan(ranks)] = bins
+        strata = pd.DataFrame(codes).groupby(list(range(len(numeric)))).ngroup()
+    else:
+        strata = pd.Series(np.zeros(len(df), dtype=int))
+
+    # Shuffle the rows of each stratum and pick them by their relative position, so each
+    # stratum contributes its share of the sample and its first row goes before the rest
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), strata.to_numpy()))
+    sorted_strata = pd.Series(strata.to_numpy()[order])
+    position = sorted_strata.groupby(sorted_strata).cumcount().to_numpy()
+    size = sorted_strata.map(sorted_strata.value_counts()).to_numpy()
+    selected = order[np.argsort(position / size, kind='stable')[:max_lines]]
+    return df.iloc[np.sort(selected)]
+
+
+FILTER_OPERATORS = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='],
+                    ['eq ', '='], ['contains '], ['datestartswith ']]
+COMPARISONS = {'ge': 'ge', '>=': 'ge', 'le': 'le', '<=': 'le', 'lt': 'lt', '<': 'lt',
+               'gt': 'gt', '>': 'gt', 'ne': 'ne', '!=': 'ne', 'eq': 'eq', '=': 'eq'}
+
+
+def split_filter_part(filter_part: str) -> Tuple[Optional[str], Optional[str], Any]:
+    """
+    Splits one condition of a DataTable `filter_query` (e.g. `{message} contains bake`) in its
+    column, operator and value.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(operator, 1)
+            name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+            value_part = value_part.strip()
+            if value_part and value_part[0] == value_part[-1] and value_part[0] in ('"', "'", '`'):
+                value = value_part[1: -1].replace('\\' + value_part[0], value_part[0])
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+
+            return name, operator_type[0].strip(), value
+    return None, None, None
+
+
+def query_table(df: pd.DataFrame, filter_query: Optional[str] = None,
+                sort_by: Optional[List[dict]] = None) -> pd.DataFrame:
+    """
+    Applies the custom filter and sort of a DataTable to a DataFrame.
+
+    Args:
+        df (pd.DataFrame): The rows of the table.
+        filter_query (str, optional): The `filter_query` of the table.
+        sort_by (List[dict], optional): The `sort_by` of the table.
+
+    Returns:
+        pd.DataFrame: The filtered and sorted rows.
+    """
+    for filter_part in (filter_query or '').split(' && '):
+        name, operator, value = split_filter_part(filter_part)
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if operator in COMPARISONS:
+            if isinstance(value, float) and not pd.api.types.is_numeric_dtype(column):
+                column = pd.to_numeric(column, errors='coerce')
+            elif not isinstance(value, float) and pd.api.types.is_numeric_dtype(column):
+                continue
+            elif not isinstance(value, float):
+                column = column.astype(str)
+            df = df.loc[getattr(column, COMPARISONS[operator])(value)]
+        elif operator == 'contains':
+            df = df.loc[column.astype(str).str.contains(str(value), case=False, regex=False)]
+        elif operator == 'datestartswith':
+            df = df.loc[column.astype(str).str.startswith(str(value))]
+
+    sort_by = [col for col in sort_by or [] if col['column_id'] in df.columns]
+    if sort_by:
+        df = df.sort_values([col['column_id'] for col in sort_by],
+                            ascending=[col['direction'] == 'asc' for col in sort_by],
+                            kind='stable')
+    return df
@@ -0,0 +1,228 @@
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from config.settings import COMPUTE_JOB_WORKERS, COMPUTE_JOB_TIMEOUT, COMPUTE_JOB_POLL, \
+    COMPUTE_SLIDERS
+from src.utils import utils_speckle
+from src.utils.utils_database import compute_db, JOB_DONE, JOB_FAILED
+
+
+def parameters_hash(slider_values: dict) -> str:
+    """
+    Returns the canonical hash of the compute parameters of a submission: the same parameters
+    give the same hash whatever their order, their type (3 or 3.0) or the commit message.
+    """
+    parameters = {}
+    for name in sorted(COMPUTE_SLIDERS):
+        value = slider_values.get(name)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        parameters[name] = value
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True,
+                                     separators=(',', ':')).encode()).hexdigest()
+
+
+def job_marker(job: dict) -> str:
+    """
+    Returns the text added to the commit message of a job, it ties the baked commit to the job.
+    """
+    return f'[compute job {job["id"]}]'
+
+
+class AppserverBackend:
+    """
+    Runs a job with the Rhino.compute appserver: the slider values are stored for the appserver
+    (which bakes the latest ones) and the job ends with the commit baked from them. The commit
+    is the one the appserver reports for the id of the slider values (`/api/results`), or else
+    the commit of a compute model whose message has the marker of the job. Other commits of the
+    compute models (e.g. manual ones) are never taken as the result of the job.
+
+    The appserver bakes one set of values at a time, so a pool with this backend runs one job at
+    a time (`max_workers`).
+
+    Args:
+        timeout (float, optional): Seconds to wait for the commit of the bake.
+        poll (float, optional): Seconds between the checks of the compute model.
+    """
+
+    max_workers = 1
+
+    def __init__(self, timeout: float = COMPUTE_JOB_TIMEOUT, poll: float = COMPUTE_JOB_POLL):
+        self.timeout = timeout
+        self.poll = poll
+
+    def run(self, job: dict) -> dict:
+        marker = job_marker(job)
+        message = job.get('commit_message')
+        slider_values_id = compute_db.insert_slider_values(
+            dict(job, commit_message=f'{message} {marker}' if message else marker))
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            reported = compute_db.slider_values_commit(slider_values_id)
+            if reported is not None:
+                return dict(reported, slider_values_id=slider_values_id)
+
+            model_name, commit_id = utils_speckle.find_compute_commit(marker)
+            if commit_id is not None:
+                return {'slider_values_id': slider_values_id, 'model_name': model_name,
+                        'commit_id': commit_id}
+        raise TimeoutError(f'No commit of the bake after {self.timeout}s')
+
+
+class JobWorkerPool:
+    """
+    Pool of threads that run the queued compute jobs with a backend, `workers` jobs at most at
+    the same time. The queue lives in the `compute_jobs` table, so it survives restarts (the
+    jobs left running are queued again).
+
+    Args:
+        backend (optional): Object with a `run(job) -> dict` method that returns the commit
+            baked for that job (it is recorded as the result of its parameters),
+            `AppserverBackend` by default. Its `max_workers` attribute, if any, caps `workers`.
+        workers (int, optional): Number of jobs run at the same time.
+        poll (float, optional): Seconds an idle worker waits before checking the queue.
+    """
+
+    def __init__(self, backend=None, workers: int = COMPUTE_JOB_WORKERS,
+                 poll: float = COMPUTE_JOB_POLL) -> None:
+        self.backend = backend or AppserverBackend()
+        max_workers = getattr(self.backend, 'max_workers', None)
+        if max_workers is not None and workers > max_workers:
+            logging.warning(f'{type(self.backend).__name__} runs {max_workers} compute jobs at '
+                            f'most, {workers} workers requested')
+            workers = max_workers
+        self.workers = workers
+        self.poll = poll
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """
+        Starts the worker threads if they aren't running.
+        """
+        with self._lock:
+            if any(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            requeued = compute_db.requeue_running_jobs()
+            if requeued:
+                logging.info(f'{requeued} interrupted compute jobs queued again')
+            self._threads = [threading.Thread(target=self._run, name=f'compute-job-{i}',
+                                              daemon=True) for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+        logging.info(f'Started {self.workers} compute job workers')
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def enqueue(self, slider_values: dict) -> Tuple[int, bool]:
+        """
+        Queues a compute job (starting the workers if needed), identical parameters already
+        queued or running share their job.
+
+        Returns:
+            Tuple[int, bool]: The id of the job and if it is a new job.
+        """
+        job_id, created = compute_db.enqueue_job(parameters_hash(slider_values), slider_values)
+        self.start()
+        self._wake.set()
+        return job_id, created
+
+    def enqueue_many(self, slider_values_list: List[dict]) -> List[Tuple[int, bool]]:
+        """
+        Queues several compute jobs in one transaction, see `enqueue`.
+
+        Returns:
+            List[Tuple[int, bool]]: The id of each job and if it is a new job, in the same order.
+        """
+        jobs = compute_db.enqueue_jobs([(parameters_hash(slider_values), slider_values)
+                                        for slider_values in slider_values_list])
+        self.start()
+        self._wake.set()
+        return jobs
+
+    def run_job(self, job: dict) -> None:
+        try:
+            # The parameters may have been computed since the job was queued
+            cached = compute_db.get_result(job['params_hash'])
+            if cached is not None:
+                compute_db.finish_job(job['id'], JOB_DONE, result={
+                    'model_name': cached['model_name'], 'commit_id': cached['commit_id'],
+                    'cached': True})
+                logging.info(f'Compute job {job["id"]} already computed in the commit '
+                             f'{cached["commit_id"]}')
+                return
+
+            result = self.backend.run(job)
+            compute_db.finish_job(job['id'], JOB_DONE, result=result)
+            if result and result.get('commit_id'):
+                compute_db.save_result(job['params_hash'], result['commit_id'],
+                                       result.get('model_name'))
+            logging.info(f'Compute job {job["id"]} done')
+        except Exception as e:
+            if self._stop.is_set():
+                # Interrupted by the shutdown, the job is queued again by the next start
+                logging.warning(f'Compute job {job["id"]} interrupted: {e}')
+                return
+            logging.exception(f'Compute job {job["id"]} failed: {e}')
+            compute_db.finish_job(job['id'], JOB_FAILED, error=str(e))
+        # The bake adds a new commit, the cached models and iframe urls are outdated
+        utils_speckle.invalidate_models()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = compute_db.claim_job()
+            except Exception as e:
+                logging.exception(f'Error reading the compute jobs: {e}')
+                job = None
+            if job is None:
+                self._wake.wait(self.poll)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+
+job_pool = JobWorkerPool()
+atexit.register(job_pool.stop)  # Before the compute database is closed
+
+
+def cached_result(slider_values: dict) -> Optional[dict]:
+    """
+    Returns the commit already computed for the parameters of a submission, if any.
+    """
+    return compute_db.get_result(parameters_hash(slider_values))
+
+
+def record_result(slider_values: dict, commit_id: str, model_name: Optional[str] = None) -> str:
+    """
+    Records the commit computed for the parameters of a submission (e.g. reported by the
+    appserver), returns the hash of the parameters.
+    """
+    params_hash = parameters_hash(slider_values)
+    compute_db.save_result(params_hash, commit_id, model_name)
+    return params_hash
+
+
+def report_commit(slider_values_id: int, commit_id: str,
+                  model_name: Optional[str] = None) -> Optional[str]:
+    """
+    Records the commit the appserver baked from a set of stored slider values: the job waiting
+    for it ends, and it becomes the result of its parameters. Returns the hash of the
+    parameters, or None if the slider values don't exist.
+    """
+    parameters = compute_db.report_commit(slider_values_id, commit_id, model_name)
+    if parameters is None:
+        return None
+    return record_result(parameters, commit_id, model_name)
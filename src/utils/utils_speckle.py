@@ -1,19 +1,67 @@
+import json
 import logging
-from typing import List, Tuple, Dict, Optional
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import List, Tuple, Dict, Optional, Iterator
 
 import pandas as pd
+from gql import gql
 from specklepy.api import operations
 from specklepy.api.client import SpeckleClient
 from specklepy.api.credentials import get_default_account
+from specklepy.core.api.models import Commit, Commits
 from specklepy.objects import Base
 from specklepy.transports.server import ServerTransport
 
-from config.settings import SPECKLE_MODEL_ID, SPECKLE_HOST, SPECKLE_PROJECT
+from utils.utils_cache import ObjectCacheTransport, TTLCache
+from config.settings import SPECKLE_MODEL_ID, SPECKLE_HOST, SPECKLE_PROJECT, \
+    SPECKLE_FETCH_WORKERS, SPECKLE_FETCH_TIMEOUT, SPECKLE_MODELS_LIMIT, \
+    SPECKLE_COMMITS_PAGE_SIZE, SPECKLE_COMMITS_MAX, SPECKLE_PARTIAL_RECEIVE, SPECKLE_MODELS_TTL
 
 project_id = SPECKLE_PROJECT
 model_id: str = SPECKLE_MODEL_ID  # TODO: Make this selectable
-store_commits_names: list = []
-store_dict_attributes: dict = {}
+store_commits_names: set = set()
+store_commits_metadata: list = []
+store_attributes: pd.DataFrame = pd.DataFrame()
+store_sync_cursors: dict = {}  # High-water mark (latest createdAt) of each synced model
+store_retry_commits: dict = {}  # Commits that could not be processed in the last sync
+models_cache = TTLCache(SPECKLE_MODELS_TTL)  # Listing of the models and their latest commit
+embed_urls_cache = TTLCache(SPECKLE_MODELS_TTL)  # Iframe urls by (models, commits)
+commits_model_name = 'compute/facade'  # Model of the commits selected in the dashboard
+
+DATA_CHUNK_TYPE = 'Speckle.Core.Models.DataChunk'
+COMMITS_PAGE_QUERY = gql(
+    """
+    query ModelCommitsPage(
+            $stream_id: String!,
+            $name: String!,
+            $limit: Int!,
+            $cursor: String
+        ) {
+        stream(id: $stream_id) {
+            branch(name: $name) {
+                commits(limit: $limit, cursor: $cursor) {
+                    totalCount
+                    cursor
+                    items {
+                        id
+                        message
+                        referencedObject
+                        sourceApplication
+                        totalChildrenCount
+                        parents
+                        authorId
+                        authorName
+                        branchName
+                        createdAt
+                    }
+                }
+            }
+        }
+    }
+    """
+)
 
 
 # Initialize Speckle clients and obtain initial data
@@ -38,34 +86,203 @@ def initialize_client(host: str = 'https://app.speckle.systems/') -> SpeckleClie
         return None
 
 
-client: SpeckleClient = initialize_client()
-transport = ServerTransport(client=client, stream_id=project_id)
+client: Optional[SpeckleClient] = None
+transport: Optional[ServerTransport] = None
+client_lock = threading.Lock()
+object_cache = ObjectCacheTransport(source=lambda: get_transport())
+
+
+def get_client() -> SpeckleClient:
+    """
+    Returns the Speckle client, authenticating it on first use so importing this module never
+    waits on the network.
+
+    Returns:
+        SpeckleClient: The authenticated client.
+    """
+    global client
+    with client_lock:
+        if client is None:
+            client = initialize_client()
+        if client is None:
+            raise ConnectionError(f"Speckle client for project '{project_id}' is not available")
+        return client
+
+
+def use_backend(speckle_client, server_transport,
+                cache: Optional[ObjectCacheTransport] = None) -> None:
+    """
+    Replaces the Speckle client and server transport (e.g. by the offline stand-in of
+    `utils_fake_speckle`) and clears the stored data of the previous backend.
+
+    Args:
+        speckle_client: The client used for the GraphQL requests.
+        server_transport: The transport used to download objects.
+        cache (ObjectCacheTransport, optional): The local object cache to use.
+    """
+    global client, transport, object_cache, store_attributes
+    with client_lock:
+        client, transport = speckle_client, server_transport
+    if cache is not None:
+        object_cache = cache
+        if object_cache.source is None:
+            object_cache.source = get_transport
+
+    store_commits_names.clear()
+    store_commits_metadata.clear()
+    store_attributes = pd.DataFrame()
+    store_sync_cursors.clear()
+    store_retry_commits.clear()
+    invalidate_models()
+
+
+def get_transport() -> ServerTransport:
+    """
+    Returns the server transport of the project, created on first use.
+
+    Returns:
+        ServerTransport: The transport used to download objects.
+    """
+    global transport
+    speckle_client = get_client()
+    with client_lock:
+        if transport is None:
+            transport = ServerTransport(client=speckle_client, stream_id=project_id)
+        return transport
 
 
 # Get data associated to the model
+def list_models() -> list:
+    """
+    Lists the models of the project with their latest commit. The listing is shared by every
+    callback and cached for SPECKLE_MODELS_TTL seconds.
+
+    Returns:
+        list: The models (branches) of the project.
+    """
+    def branch_list():
+        models = get_client().branch.list(project_id, branches_limit=SPECKLE_MODELS_LIMIT,
+                                          commits_limit=1)
+        if isinstance(models, Exception):
+            raise models
+        return models
+
+    return models_cache.get_or_set('models', branch_list)
+
+
+def invalidate_models() -> None:
+    """
+    Drops the cached listing of the models and the iframe urls, e.g. after a new bake.
+    """
+    models_cache.invalidate()
+    embed_urls_cache.invalidate()
+
+
+def find_compute_commit(text: str, max_commits: int = 10) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the name of the compute model and the id of the newest of its latest `max_commits`
+    commits whose message contains `text`, or (None, None) if there isn't any.
+    """
+    for model in list_models():
+        if model.name.startswith('compute/'):
+            for commit in iter_model_commits(model.name, page_size=max_commits,
+                                             max_commits=max_commits):
+                if commit.message and text in commit.message:
+                    return model.name, commit.id
+    return None, None
+
+
 def model_metadata() -> Tuple[str, List[str]]:
     """
-    Get the names of the branches of a stream.
+    Get the names of the branches of a stream. The names are kept in the local cache for the
+    warm start of the next run, and `models_names` and `compute_models_names` are updated in
+    place.
 
     Returns:
         Tuple[str, List[str]]: A tuple containing the initial branch and a list of branch names.
     """
     try:
-        models = client.branch.list(project_id)
-        models_names = [model.name for model in models]
-        initial_model = models_names[0] if models_names else None
-        return initial_model, models_names
+        models = list_models()
+        names = [model.name for model in models]
+        object_cache.set_value('models_names', names)
 
     except Exception as e:
         logging.exception(f"No models found in project '{project_id}': {e}")
         return "", []
 
+    models_names[:] = names
+    compute_models_names[:] = [name for name in names if name.startswith('compute/')]
+    initial_model = names[0] if names else None
+    return initial_model, names
+
+
+def cached_model_metadata() -> Tuple[str, List[str]]:
+    """
+    Get the names of the branches stored by the last run, without calling Speckle.
+
+    Returns:
+        Tuple[str, List[str]]: A tuple containing the initial branch and a list of branch names.
+    """
+    try:
+        names = object_cache.get_value('models_names') or []
+    except Exception as e:
+        logging.exception(f"Error reading the cached models of project '{project_id}': {e}")
+        names = []
+    initial_model = names[0] if names else None
+    return initial_model, names
+
 
-default_model, models_names = model_metadata()
+# Warm start from the local cache, the background sync refreshes the names from Speckle
+default_model, models_names = cached_model_metadata()
 compute_models_names = [name for name in models_names if name.startswith('compute/')]
 
 
-def model_data(names_models: List[str], selected_commits: Optional[List[str]] = None):
+def iter_model_commits(name_model: str, page_size: int = SPECKLE_COMMITS_PAGE_SIZE,
+                       max_commits: int = SPECKLE_COMMITS_MAX,
+                       since: Optional[datetime] = None) -> Iterator[Commit]:
+    """
+    Iterates over the commits of a model, newest first. The history is fetched page by page
+    following the cursor of the server, so only one page is kept in memory at a time.
+
+    Args:
+        name_model (str): The name of the model.
+        page_size (int, optional): The number of commits requested per page.
+        max_commits (int, optional): Maximum number of commits to iterate, 0 for the whole
+            history.
+        since (datetime, optional): Stop at the first commit created at or before this date.
+
+    Yields:
+        Commit: The commits of the model.
+    """
+    cursor = None
+    count = 0
+    while True:
+        limit = min(page_size, max_commits - count) if max_commits else page_size
+        page = get_client().branch.make_request(
+            query=COMMITS_PAGE_QUERY,
+            params={'stream_id': project_id, 'name': name_model, 'limit': limit,
+                    'cursor': cursor},
+            return_type=['stream', 'branch', 'commits'],
+            schema=Commits)
+        if isinstance(page, Exception):
+            raise page
+
+        for commit in page.items:
+            if since is not None and commit.createdAt <= since:
+                return
+            yield commit
+            count += 1
+
+        if not page.items or page.cursor is None or len(page.items) < limit or \
+                (max_commits and count >= max_commits):
+            return
+        cursor = page.cursor.isoformat() if isinstance(page.cursor, datetime) else page.cursor
+
+
+def model_data(names_models: List[str], selected_commits: Optional[List[str]] = None,
+               since: Optional[Dict[str, datetime]] = None,
+               max_commits: int = SPECKLE_COMMITS_MAX,
+               commits_model: Optional[str] = None):
     """
     Returns the latest commit, all commit data, the latest commit object, and an authenticated
     server transport.
@@ -73,41 +290,50 @@ def model_data(names_models: List[str], selected_commits: Optional[List[str]] =
     Args:
         names_models: The names of the models.
         selected_commits: The selected commits.
+        since: High-water mark of each model, only the commits created after it are returned.
+        max_commits: Maximum number of commits read from each model, 0 for the whole history.
+        commits_model: The model of the selected commits, `commits_model_name` by default.
     Returns:
         Tuple[Base, List[Dict[str, Any]], Base, ServerTransport]: A tuple containing the latest
         commit
         object, a list of all commit data, the latest commit object, and an authenticated server
         transport.
     """
-    models = client.branch.list(project_id)
+    models = list_models()
 
     # Filter the selected models
-    if selected_commits:
-        names_models.append('compute/facade')
+    commits_model = commits_model or commits_model_name
+    if selected_commits and commits_model not in names_models:
+        names_models.append(commits_model)
     filter_model = [b for b in models if b.name in names_models]
     # for model in names_models:
     #     filter_model += [b for b in models if b.name == model]
     selected_models_ids = [b.id for b in filter_model]
 
-    # Get the commits of the selected models
-    commits = [model.commits.items for model in filter_model]
-
-    if not commits:
+    if not filter_model:
         raise ValueError(f"No commits found for branch '{names_models}' in stream '{model_id}'")
 
-    # Commits metadata for the commits
-    model_commit_metadata = [
-        {k: v for k, v in c.__dict__.items() if k != 'authorAvatar'}
-        for commit in commits for c in commit
-    ]
-
-    # Get the latest commit
-    latest_commits = [commit[0].id for commit in commits]
-
-    # Delete the latest item from the list (compute/facade) and add the selected commits
+    # Commits metadata for the commits, streamed page by page
+    since = since or {}
+    model_commit_metadata = []
+    latest_commits = []
+    for model in filter_model:
+        listed_commits = model.commits.items if model.commits else []
+        latest_commits.append(listed_commits[0].id if listed_commits else None)
+
+        # The listing already holds the latest commit, otherwise page through the history
+        commits = listed_commits if max_commits == 1 else iter_model_commits(
+            model.name, max_commits=max_commits, since=since.get(model.name))
+        model_commit_metadata.extend(
+            {k: v for k, v in c.__dict__.items() if k != 'authorAvatar'}
+            for c in commits if model.name not in since or c.createdAt > since[model.name])
+
+    # The selected commits replace the latest commit of their model
     if selected_commits:
-        latest_commits.pop()
-        latest_commits.extend([selected_commits])
+        filter_names = [b.name for b in filter_model]
+        if commits_model not in filter_names:
+            raise ValueError(f"No model '{commits_model}' in stream '{model_id}'")
+        latest_commits[filter_names.index(commits_model)] = selected_commits
 
     return names_models, selected_models_ids, model_commit_metadata, latest_commits
 
@@ -149,40 +375,217 @@ def extract_metadata(commit_id, base_obj):
     return brep_values
 
 
-def aggregate_extracted_metadata(brep_values):
-    # If you want to evaluate the overall commit data you should use aggregations
+def fetch_objects(object_ids: List[str]) -> Dict[str, dict]:
+    """
+    Gets single objects (without their children) from the local object cache, the missing ones
+    are downloaded from the server in one request and cached.
+
+    Args:
+        object_ids (List[str]): The ids of the objects.
+
+    Returns:
+        Dict[str, dict]: The parsed objects by id.
+    """
+    objects = object_cache.get_objects(object_ids)
+    missing_ids = [object_id for object_id in set(object_ids) if object_id not in objects]
+
+    if missing_ids:
+        server_transport = get_transport()
+        r = server_transport.session.post(
+            f"{server_transport.url}/api/getobjects/{server_transport.stream_id}",
+            data={'objects': json.dumps(missing_ids)}, stream=True)
+        r.raise_for_status()
+        r.encoding = 'utf-8'
+        object_cache.begin_write()
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                object_id, obj = line.split('\t', 1)
+                objects[object_id] = obj
+                object_cache.save_object(object_id, obj)
+        object_cache.end_write()
+
+    return {object_id: json.loads(obj) for object_id, obj in objects.items()}
+
+
+def resolve_references(values: list) -> list:
+    """
+    Replaces the detached references of a list by the referenced objects, and unpacks the
+    items of the chunked lists.
+    """
+    def is_reference(value):
+        return isinstance(value, dict) and value.get('speckle_type') == 'reference'
+
+    references = fetch_objects([v['referencedId'] for v in values if is_reference(v)])
+    values = [references.get(v['referencedId']) if is_reference(v) else v for v in values]
+
+    resolved = []
+    for value in values:
+        if isinstance(value, dict) and value.get('speckle_type') == DATA_CHUNK_TYPE:
+            resolved.extend(resolve_references(value.get('data', [])))
+        else:
+            resolved.append(value)
+    return resolved
+
+
+def receive_metadata(commit_id: str, object_id: str) -> List[dict]:
+    """
+    Partial receive used by `extract_metadata`. Only the objects needed to reach the metadata
+    of the pieces of the `Data` collection are downloaded, the geometry (displayValue, meshes,
+    etc.) is never requested.
+
+    Args:
+        commit_id (str): The id of the commit.
+        object_id (str): The referenced object of the commit.
+
+    Returns:
+        List[dict]: The metadata of each piece.
+    """
+    root = fetch_objects([object_id])[object_id]
+    collection_data, = resolve_references([root.get('Data', root.get('@Data'))])
+    if not isinstance(collection_data, dict):
+        return []
+
+    pieces = resolve_references([item for key, value in collection_data.items()
+                                 if key.startswith('@') and isinstance(value, list)
+                                 for item in value])
+    pieces = [piece for piece in pieces if isinstance(piece, dict) and 'speckle_type' in piece]
+    metadata = resolve_references([piece.get('metadata', piece.get('@metadata'))
+                                   for piece in pieces])
+
+    # Same attributes as the deserialized `Base.__dict__`
+    brep_values = []
+    for values in metadata:
+        if isinstance(values, dict):
+            values = {('_units' if k == 'units' else k): v for k, v in values.items()
+                      if k not in ('speckle_type', '__closure')}
+            values['commitId'] = commit_id
+            brep_values.append(values)
+
+    return brep_values
+
+
+def aggregate_commits_metadata(brep_values: List[dict]) -> pd.DataFrame:
+    """
+    Aggregates the metadata extracted from the pieces of many commits in a single grouped pass:
+    the numeric attributes are averaged and the rest take their first value.
+
+    Args:
+        brep_values (List[dict]): The metadata of the pieces of all the commits (with 'commitId').
+
+    Returns:
+        pd.DataFrame: The aggregated attributes, one row per commit indexed by commit id.
+    """
     df = pd.DataFrame(brep_values)
-    metadata_commit_values = df.agg(
-        lambda x: round(x.mean(), 2) if pd.api.types.is_numeric_dtype(x) else x.iloc[0])
-    return metadata_commit_values
+    if df.empty:
+        return df
+
+    columns = [column for column in df.columns if column != 'commitId']
+    aggregations = {column: 'mean' if pd.api.types.is_numeric_dtype(df[column]) else 'first'
+                    for column in columns}
+    metadata_commit_values = df.groupby('commitId', sort=False).agg(aggregations).round(2)
+    metadata_commit_values['commitId'] = metadata_commit_values.index
+    metadata_commit_values.index.name = None
+    return metadata_commit_values[list(df.columns)]
 
 
-def commits_data(commits: list) -> dict:
+def receive_object(object_id: str) -> Base:
     """
-    Processes commits, retrieves commit information, and filters based on provided keys.
+    Receives an object using the local object cache, only the objects missing from the cache
+    are downloaded from the server.
+
+    Args:
+        object_id (str): The id of the object.
+
+    Returns:
+        Base: The received object.
+    """
+    if not object_cache.is_complete(object_id):
+        get_transport().copy_object_and_children(id=object_id, target_transport=object_cache)
+    return operations.receive(object_id, get_transport(), object_cache)
+
+
+def commit_data(commit: dict) -> List[dict]:
+    """
+    Receives the referenced object of a commit and extracts the metadata of its pieces.
+
+    Args:
+        commit (dict): The commit metadata (needs 'id' and 'referencedObject').
+
+    Returns:
+        List[dict]: The metadata of each piece of the commit.
+    """
+    if SPECKLE_PARTIAL_RECEIVE:
+        return receive_metadata(commit['id'], commit['referencedObject'])
+
+    collection_data = receive_object(commit['referencedObject'])
+    return extract_metadata(commit['id'], collection_data.Data)
+
+
+def commits_data(commits: list, max_workers: int = SPECKLE_FETCH_WORKERS,
+                 timeout: float = SPECKLE_FETCH_TIMEOUT,
+                 failed: Optional[list] = None) -> pd.DataFrame:
+    """
+    Processes commits, retrieves commit information, and filters based on provided keys. The
+    referenced objects are downloaded concurrently by a bounded pool of workers, the metadata of
+    all of them is aggregated at once and the results keep the order of the commits.
 
     Args:
         commits (List[Base]): A list of commit objects.
+        max_workers (int, optional): Number of concurrent downloads. 1 downloads sequentially.
+        timeout (float, optional): Seconds to wait for the download of each commit.
+        failed (list, optional): Collects the commits that could not be processed.
 
     Returns:
-        Dict[int, List[str]]: A dictionary of filtered commit information keys.
+        pd.DataFrame: The aggregated attributes of each commit, indexed by commit id.
     """
-    commits_attributes = {}
-    for i, commit in enumerate(commits):
-        try:
-            # Get the metadata of the referenced object
-            collection_data = operations.receive(commit['referencedObject'], transport)
-            commit_values = extract_metadata(commit['id'], collection_data.Data)
-            # Aggregate the metadata
-            avg_commit_values = aggregate_extracted_metadata(commit_values).to_dict()
-            if avg_commit_values:
-                commits_attributes[i] = avg_commit_values
+    if not commits:
+        return pd.DataFrame()
 
-        except Exception as e:
-            logging.exception(f'Error in commit_info for commit {commit} {e}')
-            continue
+    # Commits are immutable, reuse the attributes computed in a previous run
+    cached_attributes = object_cache.get_attributes([commit['id'] for commit in commits])
+    pending_commits = [commit for commit in commits if commit['id'] not in cached_attributes]
 
-    return commits_attributes
+    brep_values = []
+    processed_ids = []
+    if pending_commits:
+        # Don't wait on shutdown, a commit that timed out must not block the rest of the results
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending_commits))))
+        try:
+            futures = [executor.submit(commit_data, commit) for commit in pending_commits]
+            for commit, future in zip(pending_commits, futures):
+                try:
+                    brep_values.extend(future.result(timeout=timeout))
+                    processed_ids.append(commit['id'])
+
+                except TimeoutError:
+                    logging.error(f'Timeout after {timeout}s in commit_info for commit {commit}')
+                    if failed is not None:
+                        failed.append(commit)
+                    continue
+
+                except Exception as e:
+                    logging.exception(f'Error in commit_info for commit {commit} {e}')
+                    if failed is not None:
+                        failed.append(commit)
+                    continue
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # Aggregate the metadata
+    new_attributes = aggregate_commits_metadata(brep_values)
+    new_records = new_attributes.to_dict('index')
+    object_cache.save_attributes({commit_id: new_records.get(commit_id, {})
+                                  for commit_id in processed_ids})
+
+    cached_attributes = pd.DataFrame.from_dict(
+        {k: v for k, v in cached_attributes.items() if v}, orient='index')
+    commits_attributes = pd.concat([df for df in (cached_attributes, new_attributes)
+                                    if not df.empty])
+    if commits_attributes.empty:
+        return commits_attributes
+    return commits_attributes.reindex(
+        [commit['id'] for commit in commits if commit['id'] in commits_attributes.index])
 
 
 def commits_data_quantities(commits: list) -> dict:
@@ -190,31 +593,87 @@ def commits_data_quantities(commits: list) -> dict:
 
 
 # Operations related with commits
+def sync_commits(names_models: List[str]) -> Tuple[list, Dict[str, datetime]]:
+    """
+    Returns the commits of the models created after their high-water mark (plus the ones that
+    failed in the previous sync) and the new mark of each model. The marks are not advanced
+    here, see `advance_sync_cursors`.
+
+    Args:
+        names_models (List[str]): The names of the models to sync.
+
+    Returns:
+        Tuple[list, Dict[str, datetime]]: The metadata of the new commits and the latest
+        createdAt of each model.
+    """
+    since = {name: store_sync_cursors[name] for name in names_models
+             if name in store_sync_cursors}
+    _, _, model_commit_metadata, _ = model_data(list(names_models), since=since)
+
+    new_commits = [commit for commit in model_commit_metadata
+                   if commit['id'] not in store_commits_names]
+    cursors = {}
+    for commit in new_commits:
+        name = commit['branchName']
+        if name not in cursors or commit['createdAt'] > cursors[name]:
+            cursors[name] = commit['createdAt']
+
+    return new_commits + list(store_retry_commits.values()), cursors
+
+
+def advance_sync_cursors(cursors: Dict[str, datetime]) -> None:
+    """
+    Advances the high-water mark of the models, once their new commits are stored.
+    """
+    for name, created_at in cursors.items():
+        if name not in store_sync_cursors or created_at > store_sync_cursors[name]:
+            store_sync_cursors[name] = created_at
+
+
+def append_attributes(commit_attributes: pd.DataFrame) -> None:
+    """
+    Appends the attributes of new commits to the stored attributes table.
+    """
+    global store_attributes
+    if commit_attributes.empty:
+        return
+    if store_attributes.empty:
+        store_attributes = commit_attributes
+    else:
+        store_attributes = pd.concat(
+            [store_attributes.drop(commit_attributes.index, errors='ignore'), commit_attributes])
+
+
 def update_commit(names_models):
     """
-    Updates the branch commits.
+    Updates the branch commits. Only the commits created since the last update are processed
+    and added to the stored tables.
     """
     try:
-        # Get commits from the models
-        names_models, _, model_commit_metadata, _ = model_data(names_models)
-        new_commits: list = [commit for commit in model_commit_metadata if commit['id'] not in
-                             store_commits_names]
+        new_commits, cursors = sync_commits(names_models)
+
+        if new_commits:
+            # Capture only the attributes of the objects baked in Compute
+            failed_commits = []
+            commit_attributes = commits_data(new_commits, failed=failed_commits)
+            append_attributes(commit_attributes)
 
-        # Capture only the attributes of the objects baked in Compute
-        filter_commit_metadata = commits_metadata(model_commit_metadata)
-        store_commits_names.extend(commit['commitId'] for commit in filter_commit_metadata)
-        selected_commit_metadata: pd.DataFrame = pd.DataFrame(filter_commit_metadata)
+            # Commits that failed are kept to be retried in the next update
+            store_retry_commits.clear()
+            store_retry_commits.update({commit['id']: commit for commit in failed_commits})
 
-        # FIXME: Dale una vuelta a esto, es correcta la condición?
-        if not new_commits and store_commits_names:
-            selected_commit_data = pd.DataFrame.from_dict(store_dict_attributes).T
-            return selected_commit_metadata, selected_commit_data
+            # Newest commits first, as they are listed by Speckle
+            unseen_commits = [commit for commit in new_commits
+                              if commit['id'] not in store_commits_names]
+            store_commits_names.update(commit['id'] for commit in unseen_commits)
+            store_commits_metadata[:0] = commits_metadata(unseen_commits)
 
-        commit_attributes = commits_data(model_commit_metadata)
-        store_dict_attributes.update(commit_attributes)
+            # Only now, an error above leaves the mark behind and the commits are synced again
+            advance_sync_cursors(cursors)
 
-        # Construct the df used in the parallel plot
-        selected_commit_data = pd.DataFrame.from_dict(store_dict_attributes).T
+        selected_commit_metadata: pd.DataFrame = pd.DataFrame(store_commits_metadata)
+        # The df used in the parallel plot
+        selected_commit_data = store_attributes
 
         return selected_commit_metadata, selected_commit_data
 
@@ -223,13 +682,16 @@ def update_commit(names_models):
         return pd.DataFrame(), pd.DataFrame()
 
 
-def merge_commits(selected_models: List[str], selected_commits: Optional[List[str]] = None) -> str:
+def merge_commits(selected_models: List[str], selected_commits: Optional[List[str]] = None,
+                  commits_model: Optional[str] = None) -> str:
     """
     Merge the base commit and the selected commits into a single dataframe.
 
     Args:
         selected_models (Optional[List[str]], optional): The selected commits. Defaults to None.
         selected_commits (Optional[List[str]], optional): The selected commits. Defaults to None.
+        commits_model (Optional[str], optional): The model of the selected commits. Defaults to
+            `commits_model_name`.
     Returns:
         str: The url of the iframe.
     """
@@ -237,7 +699,9 @@ def merge_commits(selected_models: List[str], selected_commits: Optional[List[st
         # Get latest commits from the stream and the base one
         names_models, selected_models_ids, selected_commits_ids, latest_commits_ids = model_data(
             selected_models,
-            selected_commits)
+            selected_commits,
+            max_commits=1,
+            commits_model=commits_model)
 
         base_commit_url = f"{SPECKLE_HOST}/projects/{SPECKLE_PROJECT}/models"
         iframe_style = f"#embed=%7B%22isEnabled%22%3Atrue%2C%22isTransparent%22%3Atrue%7D"
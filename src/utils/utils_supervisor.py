@@ -0,0 +1,389 @@
+import logging
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from config.settings import COMPUTE_PATHS, COMPUTE_PROBE_URL, APPSERVER_PROBE_URL, \
+    SUPERVISOR_READY_TIMEOUT, SUPERVISOR_MAX_BACKOFF, SUPERVISOR_READY_AFTER
+
+STARTING, READY, UNREADY, CRASHED, FAILED, STOPPED = \
+    'starting', 'ready', 'unready', 'crashed', 'failed', 'stopped'
+
+if os.name == 'nt':
+    import ctypes
+    from ctypes import wintypes
+
+    CREATE_SUSPENDED = 0x00000004
+    PROCESS_TERMINATE, PROCESS_SET_QUOTA, PROCESS_SUSPEND_RESUME = 0x0001, 0x0100, 0x0800
+    JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x00002000
+    JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS = 9
+
+    class _IoCounters(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    class _JobBasicLimitInformation(ctypes.Structure):
+        _fields_ = [('PerProcessUserTimeLimit', ctypes.c_int64),
+                    ('PerJobUserTimeLimit', ctypes.c_int64),
+                    ('LimitFlags', wintypes.DWORD),
+                    ('MinimumWorkingSetSize', ctypes.c_size_t),
+                    ('MaximumWorkingSetSize', ctypes.c_size_t),
+                    ('ActiveProcessLimit', wintypes.DWORD),
+                    ('Affinity', ctypes.c_size_t),
+                    ('PriorityClass', wintypes.DWORD),
+                    ('SchedulingClass', wintypes.DWORD)]
+
+    class _JobExtendedLimitInformation(ctypes.Structure):
+        _fields_ = [('BasicLimitInformation', _JobBasicLimitInformation),
+                    ('IoInfo', _IoCounters),
+                    ('ProcessMemoryLimit', ctypes.c_size_t),
+                    ('JobMemoryLimit', ctypes.c_size_t),
+                    ('PeakProcessMemoryUsed', ctypes.c_size_t),
+                    ('PeakJobMemoryUsed', ctypes.c_size_t)]
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    _kernel32.CreateJobObjectW.argtypes = [wintypes.LPVOID, wintypes.LPCWSTR]
+    _kernel32.SetInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int,
+                                                  wintypes.LPVOID, wintypes.DWORD]
+    _kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+    _kernel32.TerminateJobObject.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    _ntdll = ctypes.WinDLL('ntdll')
+    _ntdll.NtResumeProcess.argtypes = [wintypes.HANDLE]
+
+
+def probe(target: str, timeout: float = 2.0) -> bool:
+    """
+    Checks if a service answers: `tcp://host:port` checks that the port accepts connections,
+    an http(s) url that it answers without a server error.
+    """
+    try:
+        if target.startswith('tcp://'):
+            address = urlparse(target)
+            with socket.create_connection((address.hostname, address.port), timeout=timeout):
+                return True
+        return requests.get(target, timeout=timeout).status_code < 500
+    except (OSError, requests.RequestException):
+        return False
+
+
+def _assign_job(pid: int) -> Optional[int]:
+    """
+    Puts a suspended Windows process in a new Job Object and resumes it, returns the handle of
+    the job (None if it couldn't be created). The processes it starts are in the job as well,
+    even after it exits, and closing the handle kills them all.
+    """
+    process = _kernel32.OpenProcess(PROCESS_TERMINATE | PROCESS_SET_QUOTA |
+                                    PROCESS_SUSPEND_RESUME, False, pid)
+    if not process:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        job = _kernel32.CreateJobObjectW(None, None)
+        info = _JobExtendedLimitInformation()
+        info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
+        if not job or not _kernel32.SetInformationJobObject(
+                job, JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS, ctypes.byref(info),
+                ctypes.sizeof(info)) or not _kernel32.AssignProcessToJobObject(job, process):
+            logging.warning(f'No job object for the process {pid}: '
+                            f'{ctypes.WinError(ctypes.get_last_error())}')
+            if job:
+                _kernel32.CloseHandle(job)
+            job = None
+    finally:
+        # The child only runs once it is in the job, so none of its processes escapes it
+        _ntdll.NtResumeProcess(process)
+        _kernel32.CloseHandle(process)
+    return job
+
+
+def spawn_group(command: List[str], cwd: Optional[str] = None) -> subprocess.Popen:
+    """
+    Launches a child in its own process group, so it can be stopped with every process it
+    starts (e.g. the server started by `npm start`). On Windows the group is a Job Object,
+    its handle is kept in the `job` attribute of the process.
+    """
+    if os.name == 'nt':
+        process = subprocess.Popen(command, cwd=cwd, creationflags=(
+            subprocess.CREATE_NEW_PROCESS_GROUP | CREATE_SUSPENDED))
+        try:
+            process.job = _assign_job(process.pid)
+        except OSError:
+            process.kill()
+            process.wait()
+            raise
+        return process
+    return subprocess.Popen(command, cwd=cwd, start_new_session=True)
+
+
+def _group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+def terminate_group(process: subprocess.Popen, timeout: float = 10.0) -> None:
+    """
+    Terminates a child launched by `spawn_group` and the processes it started, they are killed
+    if they don't exit in `timeout` seconds. The processes left by a child that already exited
+    are also terminated.
+    """
+    if os.name == 'nt':
+        job, process.job = getattr(process, 'job', None), None
+        if job is not None:
+            # The job holds every process the child started, also once the child exited
+            _kernel32.TerminateJobObject(job, 1)
+            _kernel32.CloseHandle(job)
+        elif process.poll() is None:
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                           capture_output=True)
+        process.wait()
+        return
+
+    deadline = time.monotonic() + timeout
+    if not _group_alive(process.pid):
+        process.wait()
+        return
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        pass
+    while _group_alive(process.pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if _group_alive(process.pid):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+
+class SupervisedProcess:
+    """
+    A child process kept running by a monitor thread: it is launched without a shell in its own
+    process group, marked ready once its probe answers, and launched again with an exponential
+    backoff when it exits. The processes the child started are stopped with it, so none of them
+    keeps its port (and answers its probe) after a crash.
+
+    Args:
+        name (str): The name of the child.
+        command (List[str]): The program and its arguments.
+        cwd (str, optional): The working directory of the child.
+        probe (str, optional): The readiness probe (see `probe`), without it the child is ready
+            once it has been running for `ready_after` seconds.
+        ready_after (float, optional): Seconds a child without a probe runs before it is ready.
+        ready_timeout (float, optional): Seconds the child has to get ready before it is
+            reported as unready (it keeps running and being probed).
+        backoff (float, optional): Seconds before the first restart, doubled on each crash.
+        max_backoff (float, optional): Maximum seconds between restarts.
+        stable_after (float, optional): Seconds ready after which a crash restarts the backoff.
+        probe_interval (float, optional): Seconds between the probes and the checks of the child.
+    """
+
+    def __init__(self, name: str, command: List[str], cwd: Optional[str] = None,
+                 probe: Optional[str] = None, ready_after: float = SUPERVISOR_READY_AFTER,
+                 ready_timeout: float = SUPERVISOR_READY_TIMEOUT,
+                 backoff: float = 1.0, max_backoff: float = SUPERVISOR_MAX_BACKOFF,
+                 stable_after: float = 60.0, probe_interval: float = 0.5) -> None:
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.probe = probe
+        self.ready_after = ready_after
+        self.ready_timeout = ready_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.probe_interval = probe_interval
+        if not probe:
+            logging.warning(f'{name} has no readiness probe, it is ready once it has been '
+                            f'running for {ready_after}s')
+
+        self.state = STOPPED
+        self.restarts = 0
+        self.exit_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self._ready_at: Optional[float] = None
+        self._lock = threading.Lock()  # A child is never launched once `stop` has run
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def status(self) -> dict:
+        return {'state': self.state, 'pid': self.process.pid if self.process else None,
+                'restarts': self.restarts, 'exit_code': self.exit_code, 'error': self.error}
+
+    def start(self) -> None:
+        """
+        Starts the monitor thread if it isn't running, it launches the child.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'supervisor-{self.name}',
+                                        daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stops the child (killing it if it doesn't exit in `timeout` seconds) without restarting.
+        """
+        with self._lock:
+            self._stop.set()
+            process = self.process
+        if process is not None:
+            terminate_group(process, timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.state = STOPPED
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logging.info(f'{self.name} is {state}')
+        self.state = state
+        if state == READY:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    def _run(self) -> None:
+        backoff = self.backoff
+        while not self._stop.is_set():
+            self._ready_at = None
+            try:
+                with self._lock:
+                    if self._stop.is_set():
+                        break
+                    self.process = spawn_group(self.command, self.cwd)
+                self.error = None
+                self._set_state(STARTING)
+                self._watch()
+            except OSError as e:
+                self.error = str(e)
+                logging.error(f'Failed to start {self.name}: {e}')
+                self._set_state(FAILED)
+
+            if self._stop.is_set():
+                break
+            if self.state != FAILED:
+                self._set_state(CRASHED)
+                # The processes started by the child would keep its port
+                terminate_group(self.process)
+            # A child that was ready for a while restarts fast again
+            if self._ready_at is not None and time.monotonic() - self._ready_at > \
+                    self.stable_after:
+                backoff = self.backoff
+            logging.warning(f'{self.name} exited ({self.exit_code}), restarting in {backoff}s')
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+            self.restarts += 1
+        self._set_state(STOPPED)
+
+    def _watch(self) -> None:
+        """
+        Probes the child until it is ready, then waits for it to exit.
+        """
+        started_at = time.monotonic()
+        while not self._stop.is_set():
+            exit_code = self.process.poll()
+            if exit_code is not None:
+                self.exit_code = exit_code
+                return
+            if self.state != READY:
+                # Without a probe the child is ready once it has kept running for a while
+                if probe(self.probe) if self.probe else \
+                        time.monotonic() - started_at >= self.ready_after:
+                    self._ready_at = time.monotonic()
+                    self._set_state(READY)
+                elif time.monotonic() - started_at > self.ready_timeout:
+                    self._set_state(UNREADY)
+            self._stop.wait(self.probe_interval)
+
+
+class Supervisor:
+    """
+    Launches the processes the dashboard depends on (Rhino.compute and the appserver) in
+    parallel and keeps them running, their state is reported by `/api/health`.
+
+    Args:
+        children (List[SupervisedProcess]): The supervised processes.
+    """
+
+    def __init__(self, children: List[SupervisedProcess]) -> None:
+        self.children: Dict[str, SupervisedProcess] = {child.name: child for child in children}
+
+    def start(self, names: Optional[List[str]] = None) -> None:
+        """
+        Launches the children (or only the named ones) without waiting for them.
+        """
+        for name, child in self.children.items():
+            if names is None or name in names:
+                child.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every child is ready, returns False if the timeout expired before.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for child in self.children.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not child.wait_ready(remaining):
+                return False
+        return True
+
+    def stop(self) -> None:
+        for child in self.children.values():
+            child.stop()
+
+    def status(self) -> dict:
+        """
+        Returns the state of each child and the overall status: 'ok' when every child is
+        ready (or there are none), 'starting' while a child is starting and 'degraded'
+        otherwise.
+        """
+        children = {name: child.status() for name, child in self.children.items()}
+        states = {child['state'] for child in children.values()}
+        if states <= {READY}:
+            status = 'ok'
+        elif states <= {READY, STARTING}:
+            status = 'starting'
+        else:
+            status = 'degraded'
+        return {'status': status, 'children': children}
+
+
+def default_children() -> List[SupervisedProcess]:
+    """
+    Returns Rhino.compute (compute.geometry) and the appserver, the ones without a configured
+    path are skipped.
+    """
+    children = []
+    if COMPUTE_PATHS['compute']:
+        children.append(SupervisedProcess('compute', [COMPUTE_PATHS['compute']],
+                                          probe=COMPUTE_PROBE_URL))
+    if COMPUTE_PATHS['node'] and COMPUTE_PATHS['npm'] and COMPUTE_PATHS['appserver']:
+        children.append(SupervisedProcess(
+            'appserver', [COMPUTE_PATHS['node'], COMPUTE_PATHS['npm'], 'start'],
+            cwd=COMPUTE_PATHS['appserver'], probe=APPSERVER_PROBE_URL))
+    return children
+
+
+supervisor = Supervisor(default_children())
@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from config.settings import SPECKLE_SYNC_INTERVAL
+from src.utils import utils_speckle
+from src.utils.utils_datasets import datasets
+
+
+class SyncWorker:
+    """
+    Keeps the commit and attribute tables of the compute model current in a background thread,
+    so the Dash callbacks only read the latest snapshot instead of waiting on Speckle. The
+    version of the snapshot is increased each time a sync brings new data.
+    """
+
+    def __init__(self, interval: float = SPECKLE_SYNC_INTERVAL) -> None:
+        self.interval = interval
+        self.version = 0
+        self._commit_metadata = pd.DataFrame()
+        self._commit_data = pd.DataFrame()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Starts the worker thread if it isn't running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='speckle-sync', daemon=True)
+            self._thread.start()
+        logging.info('Started the Speckle sync worker')
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def request_sync(self) -> None:
+        """
+        Asks the worker to sync as soon as possible (starting it if needed) without waiting.
+        """
+        self.start()
+        self._wake.set()
+
+    def snapshot(self) -> Tuple[int, pd.DataFrame, pd.DataFrame]:
+        """
+        Returns the version, the commit metadata and the commit attributes of the latest sync.
+        """
+        with self._lock:
+            return self.version, self._commit_metadata, self._commit_data
+
+    def sync(self) -> None:
+        """
+        Syncs the compute model once and publishes a new snapshot if anything changed. Both
+        tables are also registered in `datasets` as 'commits' and 'attributes' with the version
+        of the snapshot.
+        """
+        utils_speckle.model_metadata()
+        selected_model = next(
+            (model for model in utils_speckle.models_names if model.startswith('compute/')), None)
+        if selected_model is None:
+            return
+
+        commit_metadata, commit_data = utils_speckle.update_commit([selected_model])
+        with self._lock:
+            # The stored tables only grow, empty tables mean that the update failed
+            if commit_metadata.empty and not self._commit_metadata.empty:
+                return
+            if commit_metadata.equals(self._commit_metadata) and \
+                    commit_data.equals(self._commit_data):
+                return
+            self._commit_metadata, self._commit_data = commit_metadata, commit_data
+            self.version += 1
+            datasets.put('commits', self.version, commit_metadata)
+            datasets.put('attributes', self.version, commit_data)
+        logging.info(f'Speckle data updated to version {self.version}')
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                logging.exception(f'Error in the Speckle sync worker: {e}')
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+sync_worker = SyncWorker()
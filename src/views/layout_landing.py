@@ -3,7 +3,8 @@ import sys
 import dash
 import dash_bootstrap_components as dbc
 from dash import dash_table, dcc, html
-from src.config.settings import COMPUTE_SCRIPTS
+from src.config.settings import COMPUTE_SCRIPTS, SPECKLE_SYNC_POLL_MS, PARCOORDS_CLIENTSIDE, \
+    COMPUTE_SLIDERS
 
 from src.static.style import (content_style_dict, sidebar_hidden_dict, PANEL_HEIGHT)
 from src.utils.utils_speckle import models_names, compute_models_names
@@ -42,7 +43,11 @@ layout_sidebar_analysis = dbc.Col([
             'fontFamily': 'Arial',
             'fontSize': 14
         },
-        page_action='native',
+        # The pages are filtered in the server, unless the brushing is filtered in the browser
+        page_action='native' if PARCOORDS_CLIENTSIDE else 'custom',
+        sort_action='none' if PARCOORDS_CLIENTSIDE else 'custom',
+        filter_action='none' if PARCOORDS_CLIENTSIDE else 'custom',
+        page_current=0,
         page_size=5,
         style_table={'overflowX': 'auto'},
     ),
@@ -87,7 +92,7 @@ layout_speckle = dbc.Col(
         html.Span(children='Select the branches you want to visualize'),
         dcc.Dropdown(id='dropdown-branches',
                      options=[{'label': i, 'value': i} for i in models_names],
-                     value=[models_names[0]],
+                     value=models_names[:1],
                      multi=True,
                      # className='dropUp'
                      ),
@@ -131,11 +136,10 @@ compute_parameters = dbc.Row(
                                 dbc.Col(
                                     dcc.Slider(
                                         id='compute-count-slider',
-                                        min=0,
-                                        max=20,
-                                        step=1,
-                                        value=10,
-                                        marks={i: f'{i}' for i in range(0, 21, 2)},
+                                        **COMPUTE_SLIDERS['count'],
+                                        marks={i: f'{i}' for i in
+                                               range(COMPUTE_SLIDERS['count']['min'],
+                                                     COMPUTE_SLIDERS['count']['max'] + 1, 2)},
                                     ),
                                 ),
                             ]),
@@ -147,11 +151,10 @@ compute_parameters = dbc.Row(
                                 dbc.Col(
                                     dcc.Slider(
                                         id='compute-radius-slider',
-                                        min=0,
-                                        max=20,
-                                        step=1,
-                                        value=3,
-                                        marks={i: f'{i}' for i in range(0, 21, 2)},
+                                        **COMPUTE_SLIDERS['radius'],
+                                        marks={i: f'{i}' for i in
+                                               range(COMPUTE_SLIDERS['radius']['min'],
+                                                     COMPUTE_SLIDERS['radius']['max'] + 1, 2)},
                                     ),
                                 ),
                             ]),
@@ -163,11 +166,10 @@ compute_parameters = dbc.Row(
                                 dbc.Col(
                                     dcc.Slider(
                                         id='compute-span-slider',
-                                        min=0,
-                                        max=20,
-                                        step=1,
-                                        value=3,
-                                        marks={i: f'{i}' for i in range(0, 21, 2)},
+                                        **COMPUTE_SLIDERS['span'],
+                                        marks={i: f'{i}' for i in
+                                               range(COMPUTE_SLIDERS['span']['min'],
+                                                     COMPUTE_SLIDERS['span']['max'] + 1, 2)},
                                     ),
                                 ),
                             ]),
@@ -200,7 +202,8 @@ compute_parameters = dbc.Row(
                                                   placeholder='Enter a commit message like: '
                                                               'Update facade with custom '
                                                               'instructions',
-                                                  type='text'),
+                                                  type='text',
+                                                  debounce=True),
                                         dbc.Button('Bake', id='bake-button', n_clicks=0,
                                                    class_name='diagonal-pattern',
                                                    outline=False, style={'color': 'black',
@@ -229,8 +232,16 @@ content = html.Div(
 metadata_storage = html.Div([
     dcc.Store(id='side-click'),
     dcc.Store(id='slider-values-store', storage_type='memory'),
+    dcc.Store(id='store-session-id', storage_type='session'),  # Coalesces the bakes of a tab
     dcc.Store(id='store-branches-attributes', storage_type='memory'),
     dcc.Store(id='store-branches', storage_type='memory'),
+    dcc.Store(id='store-sync-version', storage_type='memory'),
+    dcc.Store(id='store-columnar', storage_type='memory'),
+    dcc.Store(id='store-constraints', storage_type='memory'),
+    dcc.Store(id='store-lod-constraints', storage_type='memory'),  # Brushing of a sample
+    dcc.Store(id='store-parcoords-data', storage_type='memory'),  # Key of the drawn dataset
+    dcc.Store(id='store-cached-commit', storage_type='memory'),  # Commit of a computed bake
+    dcc.Interval(id='sync-interval', interval=SPECKLE_SYNC_POLL_MS),
     html.Div(id='dummy-output', style={'display': 'none'}),
 ])
 
@@ -0,0 +1,22 @@
+"""
+Shared setup of the tests: the app modules are importable both as `src.utils.x` and as `utils.x`,
+the databases live in a temporary directory and Speckle is unreachable.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+
+TMP_DIR = tempfile.mkdtemp(prefix='compute-tests-')
+
+TEST_ENV = {
+    'CORS_APPSERVER': 'http://127.0.0.1:5001',
+    'CORS_DASHBOARD': 'http://127.0.0.1:5000',
+    'COMPUTE_DB_PATH': os.path.join(TMP_DIR, 'compute.db'),
+    'SPECKLE_CACHE_PATH': os.path.join(TMP_DIR, 'speckle_cache.db'),
+    'SPECKLE_HOST': 'http://127.0.0.1:9',
+    'HOME': TMP_DIR,
+}
+os.environ.update(TEST_ENV)
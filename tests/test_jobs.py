@@ -0,0 +1,152 @@
+"""
+Compute job queue run with the local stand-in of Rhino.compute.
+"""
+import time
+
+import pytest
+
+from src.utils import utils_jobs
+from src.utils.utils_database import ComputeDatabase, JOB_QUEUED, JOB_RUNNING, JOB_DONE, \
+    JOB_FAILED
+from src.utils.utils_fake_compute import FakeComputeBackend, FAKE_COMPUTE_MODEL
+from src.utils.utils_jobs import JobWorkerPool, parameters_hash
+
+PARAMETERS = {'radius': 3, 'count': 10, 'span': 3, 'commit_message': 'test'}
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError(f'Timed out after {timeout}s')
+
+
+def job_status(db: ComputeDatabase, job_id: int, status: str):
+    job = db.get_job(job_id)
+    return job if job['status'] == status else None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    from src.callbacks import callback_compute
+
+    db = ComputeDatabase(str(tmp_path / 'compute.db'))
+    monkeypatch.setattr(utils_jobs, 'compute_db', db)
+    monkeypatch.setattr(callback_compute, 'compute_db', db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def make_pool(db):
+    pools = []
+
+    def make_pool(backend, workers: int = 1) -> JobWorkerPool:
+        pools.append(JobWorkerPool(backend, workers=workers, poll=0.05))
+        return pools[-1]
+
+    yield make_pool
+    for pool in pools:
+        pool.stop()
+        for thread in pool._threads:
+            thread.join(timeout=5)
+
+
+def test_identical_parameters_share_the_pending_job(db, make_pool):
+    pool = make_pool(FakeComputeBackend(duration=0.5))
+
+    job_id, created = pool.enqueue(PARAMETERS)
+    same_id, same_created = pool.enqueue(dict(PARAMETERS, radius=3.0, commit_message='other'))
+    batch = pool.enqueue_many([PARAMETERS, dict(PARAMETERS, radius=4), dict(PARAMETERS, radius=4)])
+
+    assert created and not same_created and same_id == job_id
+    assert batch[0] == (job_id, False)
+    assert batch[1][1] and batch[2] == (batch[1][0], False)
+    assert len(db.list_jobs()) == 2
+
+
+def test_job_goes_from_queued_to_running_to_done(db, make_pool):
+    backend = FakeComputeBackend(duration=0.3)
+    pool = make_pool(backend)
+
+    job_id, _ = db.enqueue_job(parameters_hash(PARAMETERS), PARAMETERS)
+    assert db.get_job(job_id)['status'] == JOB_QUEUED
+
+    pool.start()
+    wait_for(lambda: job_status(db, job_id, JOB_RUNNING))
+    job = wait_for(lambda: job_status(db, job_id, JOB_DONE))
+
+    assert job['attempts'] == 1
+    assert job['result']['model_name'] == FAKE_COMPUTE_MODEL
+    assert db.get_result(job['params_hash'])['commit_id'] == job['result']['commit_id']
+    assert backend.runs == 1
+
+
+def test_failed_job_records_the_error(db, make_pool):
+    pool = make_pool(FakeComputeBackend(duration=0.05, fail_radius=7))
+
+    job_id, _ = pool.enqueue(dict(PARAMETERS, radius=7))
+    job = wait_for(lambda: job_status(db, job_id, JOB_FAILED))
+
+    assert 'radius 7' in job['error']
+    assert db.get_result(job['params_hash']) is None
+
+
+def test_computed_parameters_are_not_run_again(db, make_pool):
+    backend = FakeComputeBackend(duration=0.05)
+    pool = make_pool(backend)
+
+    first_id, _ = pool.enqueue(PARAMETERS)
+    wait_for(lambda: job_status(db, first_id, JOB_DONE))
+    second_id, created = pool.enqueue(PARAMETERS)
+    job = wait_for(lambda: job_status(db, second_id, JOB_DONE))
+
+    assert created and second_id != first_id
+    assert job['result']['cached']
+    assert backend.runs == 1
+
+
+def test_running_jobs_are_queued_again_on_restart(db, make_pool):
+    job_id, _ = db.enqueue_job(parameters_hash(PARAMETERS), PARAMETERS)
+    assert db.claim_job()['id'] == job_id  # Left running by a crash
+
+    pool = make_pool(FakeComputeBackend(duration=0.05))
+    pool.start()
+    job = wait_for(lambda: job_status(db, job_id, JOB_DONE))
+
+    assert job['attempts'] == 2
+
+
+def test_workers_run_jobs_at_the_same_time(db, make_pool):
+    backend = FakeComputeBackend(duration=0.3)
+    pool = make_pool(backend, workers=3)
+
+    jobs = pool.enqueue_many([dict(PARAMETERS, radius=radius) for radius in range(3)])
+    for job_id, _ in jobs:
+        wait_for(lambda: job_status(db, job_id, JOB_DONE))
+
+    assert backend.max_running == 3
+
+
+def test_api_jobs_lists_and_filters_the_jobs(db, make_pool):
+    from src.core_callbacks import app
+
+    pool = make_pool(FakeComputeBackend(duration=0.05, fail_radius=7))
+    (done_id, _), (failed_id, _) = pool.enqueue_many([PARAMETERS, dict(PARAMETERS, radius=7)])
+    wait_for(lambda: job_status(db, done_id, JOB_DONE))
+    wait_for(lambda: job_status(db, failed_id, JOB_FAILED))
+    client = app.test_client()
+
+    response = client.get('/api/jobs')
+    assert response.status_code == 200
+    assert [job['id'] for job in response.get_json()['jobs']] == [failed_id, done_id]
+
+    response = client.get('/api/jobs?status=done&limit=10')
+    assert [job['id'] for job in response.get_json()['jobs']] == [done_id]
+
+    assert client.get('/api/jobs?limit=many').status_code == 400
+    assert client.get(f'/api/jobs/{failed_id}').get_json()['status'] == JOB_FAILED
+    assert client.get('/api/jobs/999').status_code == 404
@@ -0,0 +1,33 @@
+"""
+The dashboard must import without waiting on Speckle: nothing at import time authenticates the
+client or lists the models.
+"""
+import os
+import subprocess
+import sys
+
+from conftest import ROOT, TEST_ENV
+
+IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', 1.0))  # seconds
+
+# The third-party packages are imported first so that only the app's own import work is timed
+SCRIPT = """
+import time
+import dash, dash_bootstrap_components, flask_cors, numpy, pandas, plotly.express
+import specklepy.api.client, specklepy.api.credentials
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+
+def test_import_main_is_sub_second_with_speckle_unreachable(tmp_path):
+    env = dict(os.environ, **TEST_ENV)
+    env.update(PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'src'), ROOT]), HOME=str(tmp_path),
+               COMPUTE_DB_PATH=str(tmp_path / 'compute.db'),
+               SPECKLE_CACHE_PATH=str(tmp_path / 'speckle_cache.db'))
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    elapsed = float(result.stdout.strip().splitlines()[-1])
+    assert elapsed < IMPORT_BUDGET, f'import main took {elapsed:.2f}s'
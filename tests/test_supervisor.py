@@ -0,0 +1,163 @@
+"""
+Supervision of short-lived Python children: readiness, restarts and the stop of their process
+group.
+"""
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+from src.utils.utils_supervisor import SupervisedProcess, Supervisor, STARTING, READY, \
+    STOPPED, spawn_group, terminate_group
+
+posix_only = pytest.mark.skipif(os.name == 'nt', reason='the pids are checked with /proc')
+
+
+def python(code: str) -> list:
+    return [sys.executable, '-c', code]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def listener(port: int, delay: float = 0.0) -> list:
+    """A child that listens on `port` after `delay` seconds."""
+    return python(f'import socket, time; time.sleep({delay}); sock = socket.socket(); '
+                  f'sock.bind(("127.0.0.1", {port})); sock.listen(); time.sleep(60)')
+
+
+def alive(pid: int) -> bool:
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError(f'Timed out after {timeout}s')
+
+
+@pytest.fixture
+def supervised():
+    children = []
+
+    def supervised(*args, **kwargs) -> SupervisedProcess:
+        kwargs.setdefault('probe_interval', 0.05)
+        children.append(SupervisedProcess(*args, **kwargs))
+        return children[-1]
+
+    yield supervised
+    for child in children:
+        child.stop(timeout=5)
+
+
+def test_child_is_ready_once_its_probe_answers(supervised):
+    port = free_port()
+    child = supervised('listener', listener(port, delay=0.5), probe=f'tcp://127.0.0.1:{port}')
+
+    child.start()
+    time.sleep(0.2)
+    assert child.state != READY
+    assert child.wait_ready(5)
+
+    child.stop(timeout=5)
+    assert child.state == STOPPED
+    assert child.process.poll() is not None
+
+
+def test_child_without_probe_is_ready_after_running_for_a_while(supervised):
+    child = supervised('sleeper', python('import time; time.sleep(60)'), ready_after=0.5)
+
+    child.start()
+    assert not child.wait_ready(0.3)
+    assert child.wait_ready(5)
+
+
+def test_short_lived_child_without_probe_is_never_ready(supervised):
+    child = supervised('short', python('import sys, time; time.sleep(0.3); sys.exit(3)'),
+                       ready_after=1.0, backoff=0.1)
+    supervisor = Supervisor([child])
+
+    child.start()
+    deadline = time.monotonic() + 1.5
+    while time.monotonic() < deadline:
+        assert supervisor.status()['status'] != 'ok'
+        time.sleep(0.05)
+    assert child.exit_code == 3
+
+
+def test_crashed_child_restarts_with_backoff(supervised):
+    child = supervised('crash', python('import sys; sys.exit(3)'), backoff=0.1, max_backoff=0.4)
+
+    start = time.monotonic()
+    child.start()
+    wait_for(lambda: child.restarts >= 3)
+
+    # Waits of 0.1, 0.2 and 0.4 seconds before the three restarts
+    assert time.monotonic() - start >= 0.7
+    assert child.exit_code == 3
+
+
+@posix_only
+def test_terminate_group_stops_the_processes_started_by_the_child(tmp_path):
+    pid_file = tmp_path / 'pid'
+    process = spawn_group(python(
+        f'import subprocess, sys, time; '
+        f'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); '
+        f'open({str(pid_file)!r}, "w").write(str(child.pid)); time.sleep(60)'))
+    grandchild = int(wait_for(lambda: pid_file.exists() and pid_file.read_text()))
+    assert alive(grandchild)
+
+    terminate_group(process, timeout=5)
+
+    assert process.poll() is not None
+    wait_for(lambda: not alive(grandchild))
+
+
+@posix_only
+def test_terminate_group_stops_the_leftovers_of_an_exited_child(tmp_path):
+    pid_file = tmp_path / 'pid'
+    process = spawn_group(python(
+        f'import subprocess, sys; '
+        f'child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]); '
+        f'open({str(pid_file)!r}, "w").write(str(child.pid))'))
+    process.wait(5)
+    grandchild = int(wait_for(lambda: pid_file.exists() and pid_file.read_text()))
+    assert alive(grandchild)
+
+    terminate_group(process, timeout=5)
+
+    wait_for(lambda: not alive(grandchild))
+
+
+def test_api_health_is_unavailable_until_the_children_are_ready(supervised, monkeypatch):
+    from src.callbacks import callback_compute
+    from src.core_callbacks import app
+
+    port = free_port()
+    child = supervised('listener', listener(port, delay=0.5), probe=f'tcp://127.0.0.1:{port}')
+    monkeypatch.setattr(callback_compute, 'supervisor', Supervisor([child]))
+    client = app.test_client()
+
+    child.start()
+    wait_for(lambda: child.state == STARTING)
+    response = client.get('/api/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'starting'
+
+    assert child.wait_ready(5)
+    response = client.get('/api/health')
+    assert response.status_code == 200
+    assert response.get_json()['children']['listener']['state'] == READY